@@ -0,0 +1,422 @@
+from collections import OrderedDict
+from csv import writer as csv_writer
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from tracemalloc import get_traced_memory, start as start_tracing, stop as stop_tracing
+
+import click
+from rich.console import Console
+
+from csv_mitigator import ENGINE_ASYNC, ENGINE_THREADS, run
+from utils.csv_parser import parse_csv
+from utils.metrics import Metrics
+from utils.mitigation_candidate import NO_ANNOTATION, MitigationCandidate
+from utils.processor import finding_key, index_findings
+from utils.mock_veracode_server import (
+    MockVeracodeDataset,
+    MockVeracodeServer,
+    application_name,
+    finding_cwe,
+    sandbox_name,
+)
+
+MAPPINGS_FILE_PATH = Path(__file__).parent / "data" / "csv_field_mappings.csv"
+
+
+class DictMitigationCandidate:
+    """The candidate layout before it was slotted: an instance __dict__ plus an OrderedDict of actions."""
+
+    def __init__(
+        self,
+        application_name: str,
+        sandbox_name: str,
+        cwe: int,
+        flaw_id: int,
+        mitigate_by_design: str,
+        false_positive: str,
+        accept_risk: str,
+        approve: str,
+        reject: str,
+    ):
+        self.application_name = application_name
+        self.application_guid = None
+        self.sandbox_name = sandbox_name
+        self.sandbox_guid = None
+        self.cwe = cwe
+        self.flaw_id = flaw_id
+        self.mitigate_by_design = mitigate_by_design
+        self.false_positive = false_positive
+        self.accept_risk = accept_risk
+        self.approve = approve
+        self.reject = reject
+        self.actions = OrderedDict()
+
+    def add_action(self, action: str, comment: str):
+        self.actions[action] = comment
+
+    @property
+    def app_name_key(self) -> tuple[str, str]:
+        return (
+            self.application_name.strip(),
+            None if self.sandbox_name is None else self.sandbox_name.strip(),
+        )
+
+    @property
+    def flaw_key(self) -> tuple[str, int]:
+        return (self.application_name.strip(), self.flaw_id)
+
+
+def bytes_per_candidate(candidate_class, number_of_candidates: int) -> float:
+    start_tracing()
+
+    try:
+        candidates = []
+
+        for i in range(number_of_candidates):
+            candidate = candidate_class(
+                f"App {i % 1000}", None, 79, i + 1, "Benchmark", None, None, "OK", None
+            )
+
+            if candidate_class is MitigationCandidate:
+                candidate.add_action("APPDESIGN", NO_ANNOTATION)
+                candidate.add_action("ACCEPTED", NO_ANNOTATION)
+            else:
+                candidate.add_action("APPDESIGN", "Benchmark")
+                candidate.add_action("ACCEPTED", "OK")
+
+            # Parsing and the pipeline both use these, so count whatever they keep
+            candidate.flaw_key
+            candidate.app_name_key
+            candidates.append(candidate)
+
+        memory, _ = get_traced_memory()
+    finally:
+        stop_tracing()
+
+    return memory / number_of_candidates
+
+
+def measure_candidate_memory(number_of_candidates: int) -> dict:
+    """Bytes held per candidate with two actions and its keys in use, including its application name, for both layouts."""
+    return {
+        "dict_bytes_per_candidate": bytes_per_candidate(
+            DictMitigationCandidate, number_of_candidates
+        ),
+        "slotted_bytes_per_candidate": bytes_per_candidate(
+            MitigationCandidate, number_of_candidates
+        ),
+    }
+
+
+def write_mitigation_sheet(
+    file_path: str,
+    number_of_applications: int,
+    sandboxes_per_application: int,
+    rows_per_scan: int,
+) -> int:
+    row_count = 0
+
+    with open(file_path, "w", newline="", encoding="utf-8") as data_file:
+        writer = csv_writer(data_file)
+        writer.writerow(
+            [
+                "App Name",
+                "Sandbox Name",
+                "CWE ID",
+                "Findings Flaw ID",
+                "Mitigate By Design",
+                "False Positive",
+                "Accept The Risk",
+                "Approve",
+                "Reject",
+            ]
+        )
+
+        for application_index in range(number_of_applications):
+            for scan_index, sandbox in enumerate(
+                [None] + [sandbox_name(i) for i in range(sandboxes_per_application)]
+            ):
+                # A flaw ID can only appear once per application across all its scans
+                first_issue_id = scan_index * rows_per_scan + 1
+
+                for issue_id in range(first_issue_id, first_issue_id + rows_per_scan):
+                    writer.writerow(
+                        [
+                            application_name(application_index),
+                            sandbox or "",
+                            finding_cwe(issue_id),
+                            issue_id,
+                            "Benchmark mitigation",
+                            "",
+                            "",
+                            "Benchmark approval",
+                            "",
+                        ]
+                    )
+                    row_count = row_count + 1
+
+    return row_count
+
+
+def run_benchmark(
+    console: Console,
+    number_of_applications: int,
+    sandboxes_per_application: int,
+    findings_per_scan: int,
+    rows_per_scan: int,
+    latency_seconds: float,
+    error_rate: float,
+    number_of_threads: int,
+    engine: str = ENGINE_THREADS,
+    max_in_flight_requests: int = 100,
+) -> dict:
+    if (sandboxes_per_application + 1) * rows_per_scan > findings_per_scan:
+        raise ValueError(
+            "There must be enough findings per scan for every scan of an application to have its own rows."
+        )
+
+    dataset = MockVeracodeDataset(
+        number_of_applications, sandboxes_per_application, findings_per_scan
+    )
+
+    with TemporaryDirectory() as directory, MockVeracodeServer(
+        dataset, latency_seconds, error_rate
+    ) as server:
+        data_file_path = str(Path(directory) / "data.csv")
+        row_count = write_mitigation_sheet(
+            data_file_path,
+            number_of_applications,
+            sandboxes_per_application,
+            rows_per_scan,
+        )
+
+        metrics = Metrics()
+        started = perf_counter()
+
+        # The same run as the command line, so the benchmark measures what users get
+        run(
+            console,
+            mappings_file_path=str(MAPPINGS_FILE_PATH),
+            data_file_path=data_file_path,
+            number_of_threads=number_of_threads,
+            number_of_parse_processes=1,
+            application_cache_file_path=None,
+            bulk_application_resolution_threshold=100,
+            findings_cache_path=None,
+            findings_cache_ttl=0,
+            journal_file_path=None,
+            resume=False,
+            state_file_path=None,
+            plan_output_file_path=None,
+            apply_plan_file_path=None,
+            auto_apply_mitigations=True,
+            metrics=metrics,
+            engine=engine,
+            max_in_flight_requests=max_in_flight_requests,
+            base_url=server.base_url,
+        )
+
+        seconds = perf_counter() - started
+
+    mitigated_count = sum(
+        1
+        for findings in dataset.findings.values()
+        for finding in findings
+        if len(finding.get("annotations", [])) > 0
+    )
+    summary = metrics.summary()
+
+    return {
+        "rows": row_count,
+        "mitigated": mitigated_count,
+        "seconds": seconds,
+        "rows_per_second": row_count / seconds if seconds > 0 else 0,
+        "api_calls": sum(e["calls"] for e in summary["endpoints"].values()),
+        "metrics": summary,
+    }
+
+
+def measure_parse_speed(
+    console: Console, row_counts: list[int], number_of_processes: int
+) -> list[dict]:
+    """Time to parse and validate data files of each size, without any API calls."""
+    results = []
+
+    with TemporaryDirectory() as directory:
+        for requested_row_count in row_counts:
+            data_file_path = str(Path(directory) / f"parse_{requested_row_count}.csv")
+            # A hundred rows per application, so every flaw ID is unique within its application
+            row_count = write_mitigation_sheet(
+                data_file_path, max(1, requested_row_count // 100), 0, 100
+            )
+
+            started = perf_counter()
+            parsed_count = sum(
+                1
+                for _ in parse_csv(
+                    console,
+                    str(MAPPINGS_FILE_PATH),
+                    data_file_path,
+                    number_of_processes,
+                )
+            )
+            seconds = perf_counter() - started
+
+            results.append(
+                {
+                    "rows": row_count,
+                    "parsed": parsed_count,
+                    "seconds": seconds,
+                    "rows_per_second": row_count / seconds if seconds > 0 else 0,
+                }
+            )
+
+    return results
+
+
+def measure_finding_lookup(number_of_findings: int, number_of_candidates: int) -> dict:
+    """Time to match candidates to a scan's findings through the (issue_id, cwe) index and by scanning them."""
+    findings = [
+        {
+            "issue_id": issue_id,
+            "finding_details": {"cwe": {"id": finding_cwe(issue_id)}},
+        }
+        for issue_id in range(1, number_of_findings + 1)
+    ]
+    # Spread over the whole scan, so the scan is not always cut short near the start
+    step = max(1, number_of_findings // number_of_candidates)
+    flaw_keys = [
+        (issue_id, finding_cwe(issue_id))
+        for issue_id in range(1, number_of_findings + 1, step)
+    ][:number_of_candidates]
+
+    started = perf_counter()
+    findings_index = index_findings(findings)
+    indexed_matches = sum(1 for key in flaw_keys if key in findings_index)
+    indexed_seconds = perf_counter() - started
+
+    started = perf_counter()
+    scanned_matches = sum(
+        1
+        for key in flaw_keys
+        if next((f for f in findings if finding_key(f) == key), None) is not None
+    )
+    scanned_seconds = perf_counter() - started
+
+    return {
+        "findings": number_of_findings,
+        "candidates": len(flaw_keys),
+        "indexed_matches": indexed_matches,
+        "scanned_matches": scanned_matches,
+        "indexed_seconds": indexed_seconds,
+        "scanned_seconds": scanned_seconds,
+    }
+
+
+@click.command()
+@click.option("--applications", default=50, type=click.INT)
+@click.option("--sandboxes-per-application", default=2, type=click.INT)
+@click.option("--findings-per-scan", default=1000, type=click.INT)
+@click.option("--rows-per-scan", default=100, type=click.INT)
+@click.option(
+    "--latency", default=0.05, type=click.FLOAT, help="Seconds per API request."
+)
+@click.option(
+    "--error-rate",
+    default=0.0,
+    type=click.FLOAT,
+    help="Fraction of API requests that fail with a 503.",
+)
+@click.option("--number-of-threads", default=10, type=click.INT)
+@click.option(
+    "--engine",
+    default=ENGINE_THREADS,
+    type=click.Choice([ENGINE_THREADS, ENGINE_ASYNC]),
+)
+@click.option("--max-in-flight-requests", default=100, type=click.INT)
+@click.option(
+    "--parse-rows",
+    default=[10_000, 100_000, 1_000_000],
+    multiple=True,
+    type=click.INT,
+    help="Size of a data file to time parsing on its own. Can be given more than once.",
+)
+@click.option("--number-of-parse-processes", default=1, type=click.INT)
+@click.option(
+    "--lookup-findings",
+    default=10_000,
+    type=click.INT,
+    help="Number of findings in the scan when timing finding lookups.",
+)
+@click.option(
+    "--lookup-candidates",
+    default=1_000,
+    type=click.INT,
+    help="Number of candidates to match when timing finding lookups.",
+)
+@click.option(
+    "--memory-candidates",
+    default=100_000,
+    type=click.INT,
+    help="Number of candidates to build when measuring memory per candidate.",
+)
+def main(
+    applications: int,
+    sandboxes_per_application: int,
+    findings_per_scan: int,
+    rows_per_scan: int,
+    latency: float,
+    error_rate: float,
+    number_of_threads: int,
+    engine: str,
+    max_in_flight_requests: int,
+    parse_rows: list[int],
+    number_of_parse_processes: int,
+    lookup_findings: int,
+    lookup_candidates: int,
+    memory_candidates: int,
+):
+    console = Console(log_path=False)
+    results = run_benchmark(
+        Console(quiet=True),
+        applications,
+        sandboxes_per_application,
+        findings_per_scan,
+        rows_per_scan,
+        latency,
+        error_rate,
+        number_of_threads,
+        engine,
+        max_in_flight_requests,
+    )
+
+    console.log(
+        f"Processed {results['rows']} rows ({results['mitigated']} mitigated) in {results['seconds']:.2f}s: "
+        f"{results['rows_per_second']:.0f} rows/sec using {results['api_calls']} API calls."
+    )
+    console.print_json(data=results["metrics"])
+
+    for parse_result in measure_parse_speed(
+        Console(quiet=True), parse_rows, number_of_parse_processes
+    ):
+        console.log(
+            f"Parsed {parse_result['rows']} rows in {parse_result['seconds']:.2f}s: "
+            f"{parse_result['rows_per_second']:.0f} rows/sec."
+        )
+
+    lookup = measure_finding_lookup(lookup_findings, lookup_candidates)
+    console.log(
+        f"Matched {lookup['candidates']} candidates to {lookup['findings']} findings in "
+        f"{lookup['indexed_seconds']:.3f}s with the index, {lookup['scanned_seconds']:.3f}s scanning the findings."
+    )
+
+    memory = measure_candidate_memory(memory_candidates)
+    console.log(
+        f"Memory per candidate: {memory['slotted_bytes_per_candidate']:.0f} bytes, "
+        f"{memory['dict_bytes_per_candidate']:.0f} bytes with a __dict__ and OrderedDict of actions."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import unittest
+
+from rich.console import Console
+
+from csv_mitigator import ENGINE_ASYNC
+from benchmark import (
+    measure_candidate_memory,
+    measure_finding_lookup,
+    measure_parse_speed,
+    run_benchmark,
+)
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_end_to_end_against_mock_server(self):
+        results = run_benchmark(Console(quiet=True), 3, 1, 30, 5, 0, 0, 4)
+
+        self.assertEqual(30, results["rows"])
+        self.assertEqual(30, results["mitigated"])
+
+        # Applications, sandboxes and findings for each scan, then two annotation calls per scan
+        self.assertEqual(3 + 3 + 6 + 12, results["api_calls"])
+
+    def test_end_to_end_with_errors(self):
+        results = run_benchmark(Console(quiet=True), 2, 0, 10, 5, 0, 0.1, 2)
+
+        self.assertEqual(10, results["mitigated"])
+
+    def test_end_to_end_with_async_engine(self):
+        results = run_benchmark(
+            Console(quiet=True), 3, 1, 30, 5, 0, 0.1, 4, ENGINE_ASYNC, 50
+        )
+
+        self.assertEqual(30, results["rows"])
+        self.assertEqual(30, results["mitigated"])
+
+    def test_parse_speed(self):
+        results = measure_parse_speed(Console(quiet=True), [1_000, 2_000], 1)
+
+        self.assertEqual([1_000, 2_000], [r["rows"] for r in results])
+        self.assertEqual([1_000, 2_000], [r["parsed"] for r in results])
+
+    def test_finding_lookup(self):
+        lookup = measure_finding_lookup(1_000, 100)
+
+        self.assertEqual(100, lookup["candidates"])
+        self.assertEqual(100, lookup["indexed_matches"])
+        self.assertEqual(100, lookup["scanned_matches"])
+        self.assertLess(lookup["indexed_seconds"], lookup["scanned_seconds"])
+
+    def test_candidate_memory(self):
+        memory = measure_candidate_memory(10_000)
+
+        self.assertLess(
+            memory["slotted_bytes_per_candidate"],
+            memory["dict_bytes_per_candidate"],
+        )
@@ -4,16 +4,24 @@ from rich.table import Table
 from rich.prompt import Confirm
 
 from utils.api import API
+from utils.async_api import AsyncAPI
 from utils.bulk_mitigate import bulk_mitigate
-from utils.list_of_applications import acquire_application_info
+from utils.delta_state import OUTCOME_APPLIED, DeltaState
+from utils.findings_cache import FindingsCache
+from utils.journal import MitigationJournal
+from utils.metrics import Metrics
 from utils.mitigation_candidate import MitigationCandidate
-from utils.processor import get_flaws, process_candidates
+from utils.pipeline import resolve_and_process_candidates
+from utils.plan import load_plan, write_plan
 from utils.csv_parser import parse_csv
 
 console = Console(log_path=False)
 
+ENGINE_THREADS = "threads"
+ENGINE_ASYNC = "async"
 
-def print_summary(candidates: list[MitigationCandidate]):
+
+def print_summary(console: Console, candidates: list[MitigationCandidate]):
     console.log(
         "There "
         + ("is 1 flaw" if len(candidates) == 1 else f"are {len(candidates)} flaws")
@@ -37,6 +45,180 @@ def print_summary(candidates: list[MitigationCandidate]):
     console.print(table)
 
 
+def run(
+    console: Console,
+    mappings_file_path: str,
+    data_file_path: str,
+    number_of_threads: int,
+    number_of_parse_processes: int,
+    application_cache_file_path: str,
+    bulk_application_resolution_threshold: int,
+    findings_cache_path: str,
+    findings_cache_ttl: int,
+    journal_file_path: str,
+    resume: bool,
+    state_file_path: str,
+    plan_output_file_path: str,
+    apply_plan_file_path: str,
+    auto_apply_mitigations: bool,
+    metrics: Metrics,
+    engine: str = ENGINE_THREADS,
+    max_in_flight_requests: int = 100,
+    base_url: str = None,
+):
+    thread_count_pluralised = "" if number_of_threads == 1 else "s"
+    console.log(f"Using {number_of_threads} thread{thread_count_pluralised}")
+
+    if engine == ENGINE_ASYNC:
+        request_count_pluralised = "" if max_in_flight_requests == 1 else "s"
+        console.log(
+            f"Using the async engine with up to {max_in_flight_requests} request{request_count_pluralised} in flight"
+        )
+
+    if resume and journal_file_path is None:
+        console.log('Error: "--resume" requires "--journal-file-path".')
+        exit(1)
+
+    if plan_output_file_path is not None and apply_plan_file_path is not None:
+        console.log(
+            'Error: "--plan-output" and "--apply-plan" cannot be used together.'
+        )
+        exit(1)
+
+    if state_file_path is not None and apply_plan_file_path is not None:
+        console.log(
+            'Error: "--state-file-path" cannot be used with "--apply-plan", the plan has no data file rows.'
+        )
+        exit(1)
+
+    state = DeltaState(state_file_path)
+
+    with metrics.phase("parse"):
+        if apply_plan_file_path is not None:
+            candidates = list(load_plan(apply_plan_file_path))
+        else:
+            candidates = list(
+                parse_csv(
+                    console,
+                    mappings_file_path,
+                    data_file_path,
+                    number_of_parse_processes,
+                    state.is_settled,
+                )
+            )
+
+    if state.enabled:
+        row_count_pluralised = "" if len(candidates) == 1 else "s"
+        console.log(
+            f"{len(candidates)} row{row_count_pluralised} are new, changed or not yet dealt with by a previous run."
+        )
+
+    journal = MitigationJournal(journal_file_path, resume)
+
+    if resume:
+        candidate_count = len(candidates)
+        candidates = [c for c in candidates if not journal.is_complete(c)]
+        skipped_count = candidate_count - len(candidates)
+        skipped_count_pluralised = "" if skipped_count == 1 else "s"
+        console.log(
+            f"Skipping {skipped_count} flaw{skipped_count_pluralised} already mitigated according to the journal."
+        )
+
+    if len(candidates) < 1:
+        console.log("There were no candidates to process.")
+        return
+
+    api = API(console, number_of_threads, metrics, base_url)
+
+    # Findings and annotations are most of the requests, so only those move to the event loop
+    async_api = (
+        AsyncAPI(console, max_in_flight_requests, metrics, base_url)
+        if engine == ENGINE_ASYNC
+        else None
+    )
+
+    findings_cache = FindingsCache(findings_cache_path, findings_cache_ttl)
+
+    # A saved plan already holds the GUIDs and the actions still needed
+    if apply_plan_file_path is None:
+        with metrics.phase("resolve_and_evaluate"):
+            resolve_and_process_candidates(
+                console,
+                api,
+                candidates,
+                application_cache_file_path,
+                number_of_threads,
+                bulk_application_resolution_threshold,
+                findings_cache,
+                async_api,
+            )
+
+        # Filter any apps we could not get application GUIDs for
+        candidates = [c for c in candidates if c.application_guid is not None]
+
+        if len(candidates) < 1:
+            console.log("No apps could be resolved.")
+            return
+
+        # Rows already mitigated are done with until they are edited
+        if state.enabled and plan_output_file_path is None:
+            state.record_up_to_date(candidates)
+            state.save()
+
+    # Filter not found flaws
+    candidates = [c for c in candidates if len(c.actions) > 0]
+
+    if len(candidates) < 1:
+        console.log("No mitigation actions to take.")
+        return
+
+    if plan_output_file_path is not None:
+        with metrics.phase("plan"):
+            flaw_count = write_plan(plan_output_file_path, candidates)
+
+        flaw_count_pluralised = "" if flaw_count == 1 else "s"
+        console.log(
+            f'Plan to mitigate {flaw_count} flaw{flaw_count_pluralised} written to "{plan_output_file_path}".'
+        )
+        return
+
+    if apply_plan_file_path is not None:
+        # The plan file is the summary, a table of it would only slow things down
+        console.log(
+            "There "
+            + ("is 1 flaw" if len(candidates) == 1 else f"are {len(candidates)} flaws")
+            + f' to mitigate in "{apply_plan_file_path}".'
+        )
+    else:
+        with metrics.phase("summary"):
+            print_summary(console, candidates)
+
+    if not auto_apply_mitigations:
+        if not Confirm.ask("Apply mitigations?"):
+            return
+
+    with metrics.phase("apply"):
+        failed_batches = bulk_mitigate(
+            console, api, candidates, number_of_threads, journal, async_api
+        )
+
+    if state.enabled:
+        # A scan that only partly failed is retried in full next time
+        failed_scans = set(
+            [(b.application_guid, b.sandbox_guid) for b in failed_batches]
+        )
+
+        for candidate in candidates:
+            if candidate.app_guid_key not in failed_scans:
+                state.record(candidate, OUTCOME_APPLIED)
+
+        state.save()
+
+    # The annotations on these scans have changed so the cached findings are now stale
+    for scan in set([c.app_guid_key for c in candidates]):
+        findings_cache.invalidate(scan)
+
+
 @click.command()
 @click.option(
     "--mappings-file-path",
@@ -56,11 +238,85 @@ def print_summary(candidates: list[MitigationCandidate]):
     type=click.INT,
     help="Number of threads to use.",
 )
+@click.option(
+    "--engine",
+    default=ENGINE_THREADS,
+    type=click.Choice([ENGINE_THREADS, ENGINE_ASYNC]),
+    help='How to make the findings and annotation API calls. "async" makes them from one event loop over a pool of connections, so hundreds can be in flight at little memory cost.',
+)
+@click.option(
+    "--max-in-flight-requests",
+    default=100,
+    type=click.INT,
+    help='Number of findings and annotation API calls in flight at once with "--engine async".',
+)
+@click.option(
+    "--number-of-parse-processes",
+    default=1,
+    type=click.INT,
+    help="Number of processes to parse and validate the data file with. Worth raising for sheets with millions of rows.",
+)
 @click.option(
     "--application-cache-file-path",
     default=None,
     type=click.STRING,
-    help="A text file containing application name to guid mappings, one per line.",
+    help='A file in which to cache application and sandbox name to guid mappings. Kept in SQLite if it ends in ".db", otherwise CSV.',
+)
+@click.option(
+    "--bulk-application-resolution-threshold",
+    default=100,
+    type=click.INT,
+    help="Above this many distinct applications, list every application profile once instead of looking each up by name.",
+)
+@click.option(
+    "--findings-cache-path",
+    default=None,
+    type=click.STRING,
+    help="A directory in which to cache downloaded findings between runs.",
+)
+@click.option(
+    "--findings-cache-ttl",
+    default=3600,
+    type=click.INT,
+    help="Number of seconds cached findings remain valid for.",
+)
+@click.option(
+    "--journal-file-path",
+    default=None,
+    type=click.STRING,
+    help="A file in which to record each mitigation as it is applied, so an interrupted run can be resumed.",
+)
+@click.option(
+    "--resume",
+    default=False,
+    type=click.BOOL,
+    help="Set this to true to skip rows whose mitigations are all recorded in the journal file.",
+)
+@click.option(
+    "--state-file-path",
+    default=None,
+    type=click.STRING,
+    help="A file in which to remember the rows already dealt with, so later runs only process new or changed rows.",
+)
+@click.option(
+    "--metrics-file-path",
+    default=None,
+    type=click.STRING,
+    help='A file to write API call counts, latencies and phase timings to at the end of the run. Prometheus text format if it ends in ".prom", otherwise JSON.',
+)
+@click.option(
+    "--plan-output",
+    "plan_output_file_path",
+    default=None,
+    type=click.STRING,
+    help='Write the mitigations that would be applied to this file instead of applying them. CSV if it ends in ".csv", otherwise JSON lines.',
+)
+@click.option(
+    "--apply-plan",
+    "apply_plan_file_path",
+    default=None,
+    type=click.STRING,
+    help='Apply the mitigations in a file written by "--plan-output", without parsing the data file or fetching findings.',
 )
 @click.option(
     "--auto-apply-mitigations",
@@ -72,63 +328,48 @@ def main(
     mappings_file_path: str,
     data_file_path: str,
     number_of_threads: int,
+    engine: str,
+    max_in_flight_requests: int,
+    number_of_parse_processes: int,
     application_cache_file_path: str,
+    bulk_application_resolution_threshold: int,
+    findings_cache_path: str,
+    findings_cache_ttl: int,
+    journal_file_path: str,
+    resume: bool,
+    state_file_path: str,
+    metrics_file_path: str,
+    plan_output_file_path: str,
+    apply_plan_file_path: str,
     auto_apply_mitigations: bool,
 ):
-    thread_count_pluralised = "" if number_of_threads == 1 else "s"
-    console.log(f"Using {number_of_threads} thread{thread_count_pluralised}")
-
-    candidates = parse_csv(console, mappings_file_path, data_file_path)
-
-    if len(candidates) < 1:
-        console.log("There were no candidates to process.")
-        return
+    metrics = Metrics()
 
-    api = API(console)
-
-    acquire_application_info(
-        console,
-        api,
-        candidates,
-        application_cache_file_path,
-        number_of_threads,
-    )
-
-    # Filter any apps we could not get application GUIDs for
-    candidates = [c for c in candidates if c.application_guid is not None]
-
-    if len(candidates) < 1:
-        console.log("No apps could be resolved.")
-        return
-
-    flaws = get_flaws(
-        console,
-        api,
-        candidates,
-        number_of_threads,
-        debug=False,
-    )
-
-    process_candidates(
-        console,
-        candidates,
-        flaws,
-    )
-
-    # Filter not found flaws
-    candidates = [c for c in candidates if len(c.actions) > 0]
-
-    if len(candidates) < 1:
-        console.log("No mitigation actions to take.")
-        return
-
-    print_summary(candidates)
-
-    if not auto_apply_mitigations:
-        if not Confirm.ask("Apply mitigations?"):
-            return
-
-    bulk_mitigate(console, api, candidates, number_of_threads)
+    try:
+        run(
+            console,
+            mappings_file_path,
+            data_file_path,
+            number_of_threads,
+            number_of_parse_processes,
+            application_cache_file_path,
+            bulk_application_resolution_threshold,
+            findings_cache_path,
+            findings_cache_ttl,
+            journal_file_path,
+            resume,
+            state_file_path,
+            plan_output_file_path,
+            apply_plan_file_path,
+            auto_apply_mitigations,
+            metrics,
+            engine,
+            max_in_flight_requests,
+        )
+    finally:
+        if metrics_file_path is not None:
+            metrics.write(metrics_file_path)
+            console.log(f'Metrics written to "{metrics_file_path}".')
 
 
 if __name__ == "__main__":
@@ -1,10 +1,16 @@
-from requests import RequestException
-from veracode_api_py.api import VeracodeAPI, Applications, Sandboxes, Findings
+from email.utils import parsedate_to_datetime
+from requests import HTTPError, RequestException, Session
+from requests.adapters import HTTPAdapter
+from urllib import parse
+from veracode_api_py.api import VeracodeAPI
+from veracode_api_py.apihelper import APIHelper
+from veracode_api_signing.plugin_requests import RequestsAuthPluginVeracodeHMAC
 from rich.console import Console
-from time import sleep
+from utils.metrics import Metrics, endpoint_name
+from time import monotonic, perf_counter, sleep, time
 import logging
-from threading import Lock
-from secrets import randbelow
+from threading import Condition
+from secrets import SystemRandom
 
 # Disable some warnings and traceback logging from the underlying API to prevent clutter in the log
 logging.getLogger("urllib3").setLevel(logging.CRITICAL)
@@ -12,23 +18,208 @@ logging.getLogger("requests").setLevel(logging.CRITICAL)
 logging.getLogger("veracode_api_py.apihelper").setLevel(logging.CRITICAL)
 
 
+# Responses which mean the API wants us to slow down
+THROTTLING_STATUS_CODES = [429, 502, 503, 504]
+
+# Responses worth retrying, anything else (e.g. 401, 403, 404) will not succeed on a retry
+RETRYABLE_STATUS_CODES = [408, 500] + THROTTLING_STATUS_CODES
+
+MAX_ATTEMPTS = 5
+
+# Latency this many times the best seen for an endpoint means the API is queueing our requests
+LATENCY_CONGESTION_FACTOR = 3
+LATENCY_SMOOTHING = 0.2
+LATENCY_MIN_SAMPLES = 5
+
+# Exponential back-off bounds in seconds
+BACK_OFF_BASE = 0.5
+BACK_OFF_MAX = 60
+
+
+def is_throttling_error(err: Exception) -> bool:
+    if isinstance(err, HTTPError):
+        return (
+            err.response is not None
+            and err.response.status_code in THROTTLING_STATUS_CODES
+        )
+
+    # Connection failures and timeouts
+    return isinstance(err, RequestException)
+
+
+def is_retryable_error(err: Exception) -> bool:
+    if isinstance(err, HTTPError):
+        return (
+            err.response is not None
+            and err.response.status_code in RETRYABLE_STATUS_CODES
+        )
+
+    # Connection failures, timeouts and truncated responses
+    return isinstance(err, RequestException)
+
+
+def get_retry_after_seconds(err: Exception) -> float:
+    if not isinstance(err, HTTPError) or err.response is None:
+        return None
+
+    return parse_retry_after(err.response.headers.get("Retry-After"))
+
+
+def parse_retry_after(retry_after: str) -> float:
+    if retry_after is None:
+        return None
+
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time())
+    except (TypeError, ValueError):
+        return None
+
+
+class APIError(Exception):
+    pass
+
+
+class RateLimiter:
+    """Shared AIMD concurrency limit: grows by one request per window of successes, backs off as latency
+    climbs and halves when throttled. Threads above the limit wait, so this sizes the effective pool.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._last_decrease = 0.0
+        self._latency_baselines: dict[str, float] = {}
+        self._latency_averages: dict[str, float] = {}
+        self._latency_samples: dict[str, int] = {}
+        self._condition = Condition()
+
+    def acquire(self):
+        with self._condition:
+            while True:
+                pause = self.paused_until - monotonic()
+
+                if pause > 0:
+                    self._condition.wait(pause)
+                    continue
+
+                if self.in_flight < int(self.limit):
+                    self.in_flight = self.in_flight + 1
+                    return
+
+                self._condition.wait()
+
+    def _is_congested(self, endpoint: str, latency_seconds: float) -> bool:
+        if endpoint is None or latency_seconds is None:
+            return False
+
+        baseline = min(
+            self._latency_baselines.get(endpoint, latency_seconds), latency_seconds
+        )
+        average = self._latency_averages.get(endpoint, latency_seconds)
+        average = average + LATENCY_SMOOTHING * (latency_seconds - average)
+        samples = self._latency_samples.get(endpoint, 0) + 1
+
+        self._latency_baselines[endpoint] = baseline
+        self._latency_averages[endpoint] = average
+        self._latency_samples[endpoint] = samples
+
+        return (
+            samples >= LATENCY_MIN_SAMPLES
+            and average > baseline * LATENCY_CONGESTION_FACTOR
+        )
+
+    def _decrease(self, factor: float):
+        now = monotonic()
+
+        # Only decrease once per burst from requests that were already in flight
+        if now - self._last_decrease > 1:
+            self.limit = max(1.0, self.limit * factor)
+            self._last_decrease = now
+
+    def release(
+        self, throttled: bool, endpoint: str = None, latency_seconds: float = None
+    ):
+        with self._condition:
+            self.in_flight = self.in_flight - 1
+
+            if throttled:
+                self._decrease(0.5)
+            elif self._is_congested(endpoint, latency_seconds):
+                self._decrease(0.9)
+            else:
+                self.limit = min(
+                    float(self.max_concurrency), self.limit + 1 / self.limit
+                )
+
+            self._condition.notify_all()
+
+    def pause(self, seconds: float):
+        with self._condition:
+            self.paused_until = max(self.paused_until, monotonic() + seconds)
+            self._condition.notify_all()
+
+
 class API:
-    def __init__(self, console: Console):
+    def __init__(
+        self,
+        console: Console,
+        number_of_connections: int = 10,
+        metrics: Metrics = None,
+        base_url: str = None,
+    ):
         self.console = console
-        self.request_counters: dict[str, int] = {}
-        self.lock = Lock()
+        self.metrics = Metrics() if metrics is None else metrics
+        self.rate_limiter = RateLimiter(number_of_connections)
+        self.random = SystemRandom()
+
+        # One session shared by all threads so connections are reused rather than re-established per request
+        self.session = Session()
+        self.session.headers.update({"User-Agent": "veracode_csv_mitigator"})
+
+        # A base URL is only given when pointing at a local stand-in server, which does not check signatures
+        if base_url is not None:
+            self.base_url = base_url
+            adapter_prefix = "http://"
+        else:
+            console.log("Testing API connectivity...")
+            if not self.test_connection():
+                console.log(
+                    "Error: Could not connect to the Veracode API. Check your Veracode API account credentials."
+                )
+                exit(1)
+
+            self.base_url = APIHelper().base_rest_url
+            self.session.auth = RequestsAuthPluginVeracodeHMAC()
+            adapter_prefix = "https://"
+
+        self.session.mount(
+            adapter_prefix,
+            HTTPAdapter(pool_connections=1, pool_maxsize=number_of_connections),
+        )
 
-        console.log("Testing API connectivity...")
-        if not self.test_connection():
-            console.log(
-                "Error: Could not connect to the Veracode API. Check your Veracode API account credentials."
+    def back_off(self, e: Exception, attempt: int):
+        retry_after = get_retry_after_seconds(e)
+
+        if retry_after is not None:
+            # The API told us how long to wait, so hold off every thread, not just this one
+            seconds_to_wait = retry_after
+            self.rate_limiter.pause(seconds_to_wait)
+        else:
+            # Full jitter so threads that failed together do not retry together
+            seconds_to_wait = self.random.uniform(
+                0, min(BACK_OFF_MAX, BACK_OFF_BASE * 2 ** (attempt - 1))
             )
-            exit(1)
 
-    def back_off(self, e: Exception):
-        seconds_to_wait = randbelow(111) + 10
+        self.metrics.record_back_off(seconds_to_wait)
         self.console.log(
-            f'Backing off for {seconds_to_wait}s due to an API error. Request will be retried. If this occurs often consider reducing the number of threads with the "--number_of_threads" argument'
+            f'Backing off for {seconds_to_wait:.1f}s due to an API error. Request will be retried. If this occurs often consider reducing the number of threads with the "--number-of-threads" argument'
         )
         sleep(seconds_to_wait)
 
@@ -40,85 +231,113 @@ class API:
         except RequestException:
             return False
 
-    def update_counter(self, request_signature):
-        with self.lock:
-            if request_signature in self.request_counters:
-                self.request_counters[request_signature] = (
-                    self.request_counters[request_signature] + 1
-                )
-            else:
-                self.request_counters[request_signature] = 1
+    def request(self, method: str, uri: str, params: dict = None, body: dict = None):
+        # Attempt state lives here, per call, so nothing accumulates across a long run
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                return self.send_request(method, uri, params, body)
+            except Exception as err:
+                if not is_retryable_error(err) or attempt == MAX_ATTEMPTS:
+                    raise APIError(
+                        f"{method} {uri} failed after {attempt} attempt{'' if attempt == 1 else 's'}: {err}"
+                    ) from err
 
-            # Max attempts = 5
-            if self.request_counters[request_signature] > 5:
-                self.console.log("Error: Giving up, too many request errors.")
-                exit(1)
+                self.metrics.record_retry(endpoint_name(method, uri))
+                self.back_off(err, attempt)
 
-    def get_all_applications(self):
-        self.update_counter("get_all_applications")
+    def send_request(self, method: str, uri: str, params: dict, body: dict):
+        self.rate_limiter.acquire()
+        throttled = False
+        succeeded = False
+        started = perf_counter()
 
         try:
-            return Applications().get_all()
+            response = self.session.request(
+                method, self.base_url + uri, params=params, json=body, timeout=120
+            )
+            response.raise_for_status()
+            data = response.json() if len(response.content) > 0 else None
+            succeeded = True
+
+            return data
         except Exception as err:
-            self.back_off(err)
-            return self.get_all_applications()
+            throttled = is_throttling_error(err)
+            raise
+        finally:
+            endpoint = endpoint_name(method, uri)
+            latency_seconds = perf_counter() - started
+            self.metrics.record_request(endpoint, latency_seconds, succeeded)
+            self.rate_limiter.release(
+                throttled, endpoint, latency_seconds if succeeded else None
+            )
 
-    def get_applications_by_name(self, application_name: str):
-        self.update_counter(f"get_applications_by_name:{application_name}")
+    def paged_request(self, uri: str, element: str, params: dict = None):
+        return list(self.iterate_paged_request(uri, element, params))
 
-        try:
-            return Applications().get_by_name(application_name)
-        except Exception as err:
-            self.back_off(err)
-            return self.get_applications_by_name(application_name)
+    def iterate_paged_request(self, uri: str, element: str, params: dict = None):
+        params = {} if params is None else dict(params)
+        page = 0
+        total_pages = 1
+
+        while page < total_pages:
+            params["page"] = page
+            page_data = self.request("GET", uri, params)
+            total_pages = page_data.get("page", {}).get("total_pages", 0)
+            yield from page_data.get("_embedded", {}).get(element, [])
+            page = page + 1
+
+    def get_all_applications(self):
+        # Streamed page by page so callers can index the portfolio without holding every page
+        return self.iterate_paged_request(
+            "appsec/v1/applications", "applications", {"size": 500}
+        )
+
+    def get_applications_by_name(self, application_name: str):
+        return self.paged_request(
+            "appsec/v1/applications",
+            "applications",
+            {"name": parse.quote(application_name)},
+        )
 
     def get_sandboxes(self, application_guid: str):
-        self.update_counter(f"get_sandboxes:{application_guid}")
+        return self.paged_request(
+            f"appsec/v1/applications/{application_guid}/sandboxes", "sandboxes"
+        )
 
-        try:
-            return Sandboxes().get_all(application_guid)
-        except Exception as err:
-            self.back_off(err)
-            return self.get_sandboxes(application_guid)
+    def get_findings(
+        self, application_guid: str, sandbox_guid: str = None, cwes: set[int] = None
+    ):
+        params = {"scan_type": "STATIC", "include_annot": "TRUE"}
 
-    def get_findings(self, application_guid: str, sandbox_guid: str = None):
-        self.update_counter(f"get_findings:{application_guid},{sandbox_guid}")
+        if sandbox_guid is not None:
+            params["context"] = sandbox_guid
 
-        try:
-            findings = Findings().get_findings(
-                app=application_guid,
-                scantype="STATIC",
-                annot="TRUE",
-                sandbox=sandbox_guid,
-            )
-            if findings is not None:
-                return findings
-        except Exception as err:
-            self.back_off(err)
-            return self.get_findings(application_guid, sandbox_guid)
+        # Let the API leave out findings for CWEs nobody asked about
+        if cwes is not None:
+            params["cwe"] = ",".join([str(cwe) for cwe in sorted(cwes)])
+
+        # Streamed page by page so callers can discard what they do not need as it arrives
+        return self.iterate_paged_request(
+            f"appsec/v2/applications/{application_guid}/findings",
+            "findings",
+            params,
+        )
 
     def add_mitigation(
         self,
         application_guid: str,
-        flaw_id: int,
+        flaw_ids: list[int],
         action: str,
         comment: str,
         sandbox_guid: str = None,
     ):
-        self.update_counter(
-            f"add_mitigation{application_guid},{flaw_id},{action},{comment},{sandbox_guid}"
+        self.request(
+            "POST",
+            f"appsec/v2/applications/{application_guid}/annotations",
+            None if sandbox_guid is None else {"context": sandbox_guid},
+            {
+                "comment": comment,
+                "action": action,
+                "issue_list": ",".join([str(flaw_id) for flaw_id in flaw_ids]),
+            },
         )
-
-        try:
-            Findings().add_annotation(
-                application_guid,
-                [flaw_id],
-                comment,
-                action,
-                sandbox_guid,
-            )
-        except Exception as err:
-            self.back_off(err)
-            self.add_mitigation(
-                application_guid, flaw_id, action, comment, sandbox_guid
-            )
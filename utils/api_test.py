@@ -0,0 +1,119 @@
+import unittest
+
+from requests import ConnectionError, HTTPError, Response
+
+from utils.metrics import Metrics
+from utils.api import (
+    API,
+    APIError,
+    MAX_ATTEMPTS,
+    RateLimiter,
+    get_retry_after_seconds,
+    is_retryable_error,
+    is_throttling_error,
+)
+
+
+def http_error(status_code: int, headers: dict = None) -> HTTPError:
+    response = Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    return HTTPError(response=response)
+
+
+class FailingAPI(API):
+    def __init__(self, errors: list[Exception]):
+        # Skip the connectivity test and session setup
+        self.errors = errors
+        self.attempts = 0
+        self.metrics = Metrics()
+
+    def back_off(self, e: Exception, attempt: int):
+        pass
+
+    def send_request(self, method: str, uri: str, params: dict, body: dict):
+        self.attempts = self.attempts + 1
+
+        if len(self.errors) > 0:
+            raise self.errors.pop(0)
+
+        return {"ok": True}
+
+
+class TestAPI(unittest.TestCase):
+    def test_is_throttling_error(self):
+        self.assertTrue(is_throttling_error(http_error(429)))
+        self.assertTrue(is_throttling_error(http_error(503)))
+        self.assertTrue(is_throttling_error(ConnectionError()))
+        self.assertFalse(is_throttling_error(http_error(404)))
+        self.assertFalse(is_throttling_error(ValueError()))
+
+    def test_get_retry_after_seconds(self):
+        self.assertEqual(
+            3, get_retry_after_seconds(http_error(429, {"Retry-After": "3"}))
+        )
+        self.assertEqual(
+            0,
+            get_retry_after_seconds(
+                http_error(429, {"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})
+            ),
+        )
+        self.assertIsNone(get_retry_after_seconds(http_error(429)))
+        self.assertIsNone(get_retry_after_seconds(ConnectionError()))
+
+    def test_rate_limiter_halves_when_throttled_and_recovers(self):
+        limiter = RateLimiter(8)
+
+        limiter.acquire()
+        limiter.release(throttled=True)
+        self.assertEqual(4, limiter.limit)
+
+        for _ in range(30):
+            limiter.acquire()
+            limiter.release(throttled=False)
+
+        self.assertEqual(8, limiter.limit)
+        self.assertEqual(0, limiter.in_flight)
+
+    def test_is_retryable_error(self):
+        self.assertTrue(is_retryable_error(http_error(500)))
+        self.assertTrue(is_retryable_error(ConnectionError()))
+        self.assertFalse(is_retryable_error(http_error(401)))
+        self.assertFalse(is_retryable_error(KeyError()))
+
+    def test_request_retries_retryable_errors(self):
+        api = FailingAPI([http_error(503), ConnectionError()])
+
+        self.assertEqual({"ok": True}, api.request("GET", "uri"))
+        self.assertEqual(3, api.attempts)
+
+    def test_request_does_not_retry_fatal_errors(self):
+        api = FailingAPI([http_error(403)])
+
+        with self.assertRaises(APIError):
+            api.request("GET", "uri")
+
+        self.assertEqual(1, api.attempts)
+
+    def test_request_gives_up_after_max_attempts(self):
+        api = FailingAPI([http_error(503) for _ in range(MAX_ATTEMPTS + 1)])
+
+        with self.assertRaises(APIError):
+            api.request("GET", "uri")
+
+        self.assertEqual(MAX_ATTEMPTS, api.attempts)
+
+    def test_rate_limiter_backs_off_when_latency_climbs(self):
+        limiter = RateLimiter(10)
+
+        for _ in range(10):
+            limiter.acquire()
+            limiter.release(False, "GET a", 0.1)
+
+        self.assertEqual(10, limiter.limit)
+
+        for _ in range(10):
+            limiter.acquire()
+            limiter.release(False, "GET a", 2.0)
+
+        self.assertEqual(9, limiter.limit)
@@ -0,0 +1,211 @@
+from asyncio import Semaphore, sleep
+from json import JSONDecodeError, loads
+from secrets import SystemRandom
+from time import monotonic, perf_counter
+
+from aiohttp import (
+    ClientError,
+    ClientResponseError,
+    ClientSession,
+    ClientTimeout,
+    TCPConnector,
+)
+from rich.console import Console
+from veracode_api_py.apihelper import APIHelper
+from veracode_api_signing.credentials import get_credentials
+from veracode_api_signing.veracode_hmac_auth import generate_veracode_hmac_header
+from yarl import URL
+
+from utils.api import (
+    BACK_OFF_BASE,
+    BACK_OFF_MAX,
+    MAX_ATTEMPTS,
+    RETRYABLE_STATUS_CODES,
+    APIError,
+    parse_retry_after,
+)
+from utils.metrics import Metrics, endpoint_name
+
+
+def is_retryable_error(err: Exception) -> bool:
+    if isinstance(err, ClientResponseError):
+        return err.status in RETRYABLE_STATUS_CODES
+
+    # Connection failures, timeouts and truncated responses
+    return isinstance(err, (ClientError, TimeoutError, JSONDecodeError))
+
+
+def get_retry_after_seconds(err: Exception) -> float:
+    if not isinstance(err, ClientResponseError) or err.headers is None:
+        return None
+
+    return parse_retry_after(err.headers.get("Retry-After"))
+
+
+class AsyncAPI:
+    """The calls made once per scan or per batch, issued from one event loop over a pooled session so that
+    hundreds can be in flight without a thread for each. Open it with "async with" inside the loop using it.
+    """
+
+    def __init__(
+        self,
+        console: Console,
+        max_in_flight_requests: int = 100,
+        metrics: Metrics = None,
+        base_url: str = None,
+    ):
+        self.console = console
+        self.max_in_flight_requests = max_in_flight_requests
+        self.metrics = Metrics() if metrics is None else metrics
+        self.random = SystemRandom()
+        self.paused_until = 0.0
+        self.session = None
+        self._in_flight = None
+
+        # A base URL is only given when pointing at a local stand-in server, which does not check signatures
+        if base_url is not None:
+            self.base_url = base_url
+            self.credentials = None
+        else:
+            self.base_url = APIHelper().base_rest_url
+            self.credentials = get_credentials()
+
+    async def __aenter__(self):
+        # Both are bound to the running event loop, so each loop that uses the API gets its own
+        self._in_flight = Semaphore(self.max_in_flight_requests)
+        self.session = ClientSession(
+            connector=TCPConnector(limit=self.max_in_flight_requests),
+            headers={"User-Agent": "veracode_csv_mitigator"},
+            timeout=ClientTimeout(total=120),
+        )
+
+        return self
+
+    async def __aexit__(self, *args):
+        await self.session.close()
+        self.session = None
+
+    async def back_off(self, e: Exception, attempt: int):
+        retry_after = get_retry_after_seconds(e)
+
+        if retry_after is not None:
+            # The API told us how long to wait, so hold off every request, not just this one
+            seconds_to_wait = retry_after
+            self.paused_until = max(self.paused_until, monotonic() + seconds_to_wait)
+        else:
+            # Full jitter so requests that failed together do not retry together
+            seconds_to_wait = self.random.uniform(
+                0, min(BACK_OFF_MAX, BACK_OFF_BASE * 2 ** (attempt - 1))
+            )
+
+        self.metrics.record_back_off(seconds_to_wait)
+        self.console.log(
+            f'Backing off for {seconds_to_wait:.1f}s due to an API error. Request will be retried. If this occurs often consider reducing the number of requests in flight with the "--max-in-flight-requests" argument'
+        )
+        await sleep(seconds_to_wait)
+
+    async def request(
+        self, method: str, uri: str, params: dict = None, body: dict = None
+    ):
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                return await self.send_request(method, uri, params, body)
+            except Exception as err:
+                if not is_retryable_error(err) or attempt == MAX_ATTEMPTS:
+                    raise APIError(
+                        f"{method} {uri} failed after {attempt} attempt{'' if attempt == 1 else 's'}: {err}"
+                    ) from err
+
+                self.metrics.record_retry(endpoint_name(method, uri))
+                await self.back_off(err, attempt)
+
+    async def send_request(self, method: str, uri: str, params: dict, body: dict):
+        while (pause := self.paused_until - monotonic()) > 0:
+            await sleep(pause)
+
+        url = URL(self.base_url + uri)
+
+        if params is not None:
+            url = url.with_query({key: str(value) for key, value in params.items()})
+
+        headers = None
+
+        # Signed over the exact path and query sent, the same as the requests plugin does
+        if self.credentials is not None:
+            api_key_id, api_key_secret = self.credentials
+            headers = {
+                "Authorization": generate_veracode_hmac_header(
+                    url.host, url.raw_path_qs, method, api_key_id, api_key_secret
+                )
+            }
+
+        async with self._in_flight:
+            succeeded = False
+            started = perf_counter()
+
+            try:
+                async with self.session.request(
+                    method, url, json=body, headers=headers
+                ) as response:
+                    response.raise_for_status()
+                    content = await response.read()
+
+                data = loads(content) if len(content) > 0 else None
+                succeeded = True
+
+                return data
+            finally:
+                self.metrics.record_request(
+                    endpoint_name(method, uri), perf_counter() - started, succeeded
+                )
+
+    async def iterate_paged_request(self, uri: str, element: str, params: dict = None):
+        params = {} if params is None else dict(params)
+        page = 0
+        total_pages = 1
+
+        while page < total_pages:
+            params["page"] = page
+            page_data = await self.request("GET", uri, params)
+            total_pages = page_data.get("page", {}).get("total_pages", 0)
+
+            for item in page_data.get("_embedded", {}).get(element, []):
+                yield item
+
+            page = page + 1
+
+    def get_findings(
+        self, application_guid: str, sandbox_guid: str = None, cwes: set[int] = None
+    ):
+        params = {"scan_type": "STATIC", "include_annot": "TRUE"}
+
+        if sandbox_guid is not None:
+            params["context"] = sandbox_guid
+
+        if cwes is not None:
+            params["cwe"] = ",".join([str(cwe) for cwe in sorted(cwes)])
+
+        return self.iterate_paged_request(
+            f"appsec/v2/applications/{application_guid}/findings",
+            "findings",
+            params,
+        )
+
+    async def add_mitigation(
+        self,
+        application_guid: str,
+        flaw_ids: list[int],
+        action: str,
+        comment: str,
+        sandbox_guid: str = None,
+    ):
+        await self.request(
+            "POST",
+            f"appsec/v2/applications/{application_guid}/annotations",
+            None if sandbox_guid is None else {"context": sandbox_guid},
+            {
+                "comment": comment,
+                "action": action,
+                "issue_list": ",".join([str(flaw_id) for flaw_id in flaw_ids]),
+            },
+        )
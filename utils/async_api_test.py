@@ -0,0 +1,66 @@
+import unittest
+from asyncio import run
+
+from aiohttp import ClientConnectionError, ClientResponseError
+from multidict import CIMultiDict, CIMultiDictProxy
+from rich.console import Console
+
+from utils.api import APIError
+from utils.async_api import AsyncAPI, get_retry_after_seconds, is_retryable_error
+from utils.mock_veracode_server import MockVeracodeDataset, MockVeracodeServer
+
+
+def response_error(status: int, headers: dict = None) -> ClientResponseError:
+    return ClientResponseError(
+        None, (), status=status, headers=CIMultiDictProxy(CIMultiDict(headers or {}))
+    )
+
+
+class TestAsyncAPI(unittest.TestCase):
+    def test_is_retryable_error(self):
+        self.assertTrue(is_retryable_error(response_error(503)))
+        self.assertTrue(is_retryable_error(ClientConnectionError()))
+        self.assertTrue(is_retryable_error(TimeoutError()))
+        self.assertFalse(is_retryable_error(response_error(404)))
+        self.assertFalse(is_retryable_error(KeyError()))
+
+    def test_get_retry_after_seconds(self):
+        self.assertEqual(
+            3, get_retry_after_seconds(response_error(429, {"Retry-After": "3"}))
+        )
+        self.assertIsNone(get_retry_after_seconds(response_error(429)))
+
+    def test_findings_and_annotations_against_mock_server(self):
+        dataset = MockVeracodeDataset(1, 0, 250)
+        application_guid = dataset.applications[0]["guid"]
+
+        async def fetch_and_mitigate(api: AsyncAPI):
+            async with api:
+                findings = [f async for f in api.get_findings(application_guid)]
+                await api.add_mitigation(application_guid, [1, 2], "FP", "test")
+
+                # Not found is not worth retrying
+                with self.assertRaises(APIError):
+                    await api.add_mitigation("unknown", [1], "FP", "test")
+
+            return findings
+
+        with MockVeracodeServer(dataset) as server:
+            api = AsyncAPI(Console(quiet=True), 10, None, server.base_url)
+            findings = run(fetch_and_mitigate(api))
+
+        # Every page of findings
+        self.assertEqual(250, len(findings))
+        self.assertEqual(
+            3,
+            api.metrics.summary()["endpoints"][
+                "GET appsec/v2/applications/{guid}/findings"
+            ]["calls"],
+        )
+
+        annotated = [
+            f
+            for f in dataset.findings[(application_guid, None)]
+            if len(f.get("annotations", [])) > 0
+        ]
+        self.assertEqual([1, 2], [f["issue_id"] for f in annotated])
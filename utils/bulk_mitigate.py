@@ -1,36 +1,149 @@
+from asyncio import run
+
 from utils.api import API
-from utils.mitigation_candidate import MitigationCandidate
-from utils.parallel import parallel_execute_tasks_with_progress
+from utils.async_api import AsyncAPI
+from utils.journal import MitigationJournal
+from utils.mitigation_candidate import ACTION_ORDER, MitigationCandidate
+from utils.parallel import (
+    async_execute_tasks_with_progress,
+    parallel_execute_tasks_with_progress,
+)
 from rich.console import Console
 
+# Keep each annotation request to a reasonable size
+MAX_FLAWS_PER_ANNOTATION = 100
+
+
+class MitigationBatch:
+    def __init__(
+        self,
+        app_name_key: tuple[str, str],
+        application_guid: str,
+        sandbox_guid: str,
+    ):
+        self.app_name_key = app_name_key
+        self.application_name = app_name_key[0]
+        self.application_guid = application_guid
+        self.sandbox_guid = sandbox_guid
+        self.flaw_ids_by_action: dict[str, dict[str, list[int]]] = {
+            action: {} for action in ACTION_ORDER
+        }
+        self.flaw_count = 0
+
+    def add(self, candidate: MitigationCandidate):
+        for action, comment in candidate.actions.items():
+            self.flaw_ids_by_action[action].setdefault(comment, []).append(
+                candidate.flaw_id
+            )
+
+        self.flaw_count = self.flaw_count + 1
+
+    def request_count(self) -> int:
+        return sum(
+            -(-len(flaw_ids) // MAX_FLAWS_PER_ANNOTATION)
+            for comments in self.flaw_ids_by_action.values()
+            for flaw_ids in comments.values()
+        )
+
+
+def group_into_batches(
+    candidates: list[MitigationCandidate],
+) -> list[MitigationBatch]:
+    batches: dict[str, MitigationBatch] = {}
+
+    for candidate in candidates:
+        scan = candidate.app_guid_key
+
+        if scan not in batches:
+            batches[scan] = MitigationBatch(
+                candidate.app_name_key,
+                candidate.application_guid,
+                candidate.sandbox_guid,
+            )
+
+        batches[scan].add(candidate)
+
+    return list(batches.values())
+
+
+def annotation_requests(batch: MitigationBatch):
+    # Actions are applied in order so that e.g. a proposal lands before its approval
+    for action in ACTION_ORDER:
+        for comment, flaw_ids in batch.flaw_ids_by_action[action].items():
+            for index in range(0, len(flaw_ids), MAX_FLAWS_PER_ANNOTATION):
+                yield action, comment, flaw_ids[
+                    index : index + MAX_FLAWS_PER_ANNOTATION
+                ]
+
 
 def bulk_mitigate(
     console: Console,
     api: API,
     candidates: list[MitigationCandidate],
     number_of_threads: int,
-):
-    def perform_actions(candidate: MitigationCandidate):
+    journal: MitigationJournal,
+    async_api: AsyncAPI = None,
+) -> list[MitigationBatch]:
+    """Returns the batches that could not be fully applied. Given an async API, the batches are applied
+    from one event loop instead of by a pool of threads."""
+
+    def log_batch(batch: MitigationBatch):
+        flaw_count_pluralised = "" if batch.flaw_count == 1 else "s"
         console.log(
-            f"Mitigating flaw #{candidate.flaw_id} in application profile '{candidate.application_name}'..."
+            f"Mitigating {batch.flaw_count} flaw{flaw_count_pluralised} in application profile '{batch.application_name}'..."
         )
 
-        for action, comment in candidate.actions.items():
+    def perform_actions(batch: MitigationBatch):
+        log_batch(batch)
+
+        for action, comment, flaw_ids_to_mitigate in annotation_requests(batch):
             api.add_mitigation(
-                candidate.application_guid,
-                candidate.flaw_id,
+                batch.application_guid,
+                flaw_ids_to_mitigate,
                 action,
                 comment,
-                candidate.sandbox_guid,
+                batch.sandbox_guid,
+            )
+
+            journal.record(batch.app_name_key, flaw_ids_to_mitigate, action, comment)
+
+    async def perform_actions_async(batch: MitigationBatch):
+        log_batch(batch)
+
+        for action, comment, flaw_ids_to_mitigate in annotation_requests(batch):
+            await async_api.add_mitigation(
+                batch.application_guid,
+                flaw_ids_to_mitigate,
+                action,
+                comment,
+                batch.sandbox_guid,
             )
-            pass
 
+            journal.record(batch.app_name_key, flaw_ids_to_mitigate, action, comment)
+
+    async def perform_all_actions_async(name: str, batches: list[MitigationBatch]):
+        async with async_api:
+            return await async_execute_tasks_with_progress(
+                console,
+                name,
+                perform_actions_async,
+                batches,
+                async_api.max_in_flight_requests,
+                cost=MitigationBatch.request_count,
+            )
+
+    batches = group_into_batches(candidates)
     mitigation_count_pluralised = "" if len(candidates) == 1 else "s"
+    name = f"Mitigating {len(candidates)} flaw{mitigation_count_pluralised}..."
+
+    if async_api is not None:
+        return run(perform_all_actions_async(name, batches))
 
-    parallel_execute_tasks_with_progress(
+    return parallel_execute_tasks_with_progress(
         console,
-        f"Mitigating {len(candidates)} flaw{mitigation_count_pluralised}...",
+        name,
         perform_actions,
-        candidates,
+        batches,
         number_of_threads,
+        cost=MitigationBatch.request_count,
     )
@@ -0,0 +1,46 @@
+import unittest
+
+from utils.bulk_mitigate import group_into_batches
+from utils.mitigation_candidate import MitigationCandidate
+
+
+def candidate_with_actions(application_guid, sandbox_guid, flaw_id, actions):
+    candidate = MitigationCandidate(
+        "abc",
+        None,
+        1,
+        flaw_id,
+        actions.get("APPDESIGN"),
+        None,
+        None,
+        actions.get("ACCEPTED"),
+        None,
+    )
+    candidate.application_guid = application_guid
+    candidate.sandbox_guid = sandbox_guid
+
+    for action in actions:
+        candidate.add_action(action, {"action": "", "comment": ""})
+
+    return candidate
+
+
+class TestBulkMitigate(unittest.TestCase):
+    def test_group_into_batches_by_scan_action_and_comment(self):
+        candidates = [
+            candidate_with_actions("a", None, 1, {"APPDESIGN": "x", "ACCEPTED": "ok"}),
+            candidate_with_actions("a", None, 2, {"APPDESIGN": "x", "ACCEPTED": "ok"}),
+            candidate_with_actions("a", None, 3, {"APPDESIGN": "y"}),
+            candidate_with_actions("a", "s", 4, {"APPDESIGN": "x"}),
+        ]
+
+        batches = group_into_batches(candidates)
+
+        self.assertEqual(2, len(batches))
+        self.assertEqual(3, batches[0].flaw_count)
+        self.assertEqual(
+            {"x": [1, 2], "y": [3]}, batches[0].flaw_ids_by_action["APPDESIGN"]
+        )
+        self.assertEqual({"ok": [1, 2]}, batches[0].flaw_ids_by_action["ACCEPTED"])
+        self.assertEqual("s", batches[1].sandbox_guid)
+        self.assertEqual({"x": [4]}, batches[1].flaw_ids_by_action["APPDESIGN"])
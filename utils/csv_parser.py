@@ -1,7 +1,22 @@
 import csv
+from codecs import BOM_UTF8
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
 from rich.console import Console
 from utils.mitigation_candidate import MitigationCandidate
 
+# Rows handed to a worker process at a time when parsing with more than one process
+PARSE_CHUNK_SIZE = 50_000
+
+
+class CsvRowError(Exception):
+    def __init__(self, row_number: int, message: str):
+        # Both go into args so the error survives being pickled back from a worker process
+        super().__init__(row_number, message)
+        self.row_number = row_number
+        self.message = message
+
 
 def get_csv_field_mappings(console: Console, mappings_file_path: str) -> dict[str, str]:
     field_names = [
@@ -26,50 +41,166 @@ def get_csv_field_mappings(console: Console, mappings_file_path: str) -> dict[st
 
 
 def parse_csv(
-    console: Console, mappings_file_path: str, data_file_path: str
-) -> list[MitigationCandidate]:
+    console: Console,
+    mappings_file_path: str,
+    data_file_path: str,
+    number_of_processes: int = 1,
+    skip_row: Callable[[MitigationCandidate], bool] = None,
+) -> Iterator[MitigationCandidate]:
     field_mappings = get_csv_field_mappings(console, mappings_file_path)
-    data: list[MitigationCandidate] = []
 
     # Deal with UTF-8 and BOM if on Windows - https://stackoverflow.com/questions/17912307/u-ufeff-in-python-string
     encoding = "utf-8"
-    with open(data_file_path, newline="", encoding="utf-8") as file_data:
-        if "\ufeff" in file_data.read():
+    with open(data_file_path, "rb") as file_data:
+        if file_data.read(len(BOM_UTF8)) == BOM_UTF8:
             encoding = "utf-8-sig"
 
     with open(data_file_path, newline="", encoding=encoding) as file_data:
-        row_number = 1
-        processed_flaws = []
-        for row in csv.DictReader(file_data):
-            row_number = row_number + 1
-            load_row(console, data, field_mappings, row, row_number, processed_flaws)
+        if number_of_processes > 1:
+            rows = parse_chunks_in_parallel(
+                field_mappings, file_data, number_of_processes
+            )
+        else:
+            rows = parse_rows(field_mappings, csv.DictReader(file_data), 2)
 
-    return data
+        # Duplicates can be in different chunks, so they are checked here as rows come back in order
+        processed_flaws: dict[tuple[str, int], int] = {}
 
+        try:
+            for row_number, candidate in rows:
+                check_for_duplicate_flaw(candidate, row_number, processed_flaws)
 
-def load_row(
-    console,
-    data,
+                # Skipped after the duplicate check, so a new row cannot clash with a skipped one
+                if skip_row is not None and skip_row(candidate):
+                    continue
+
+                yield candidate
+        except CsvRowError as e:
+            console.log(f"Error on row {e.row_number}: {e.message}.")
+            exit(1)
+        finally:
+            rows.close()
+
+
+def parse_rows(
+    field_mappings: dict[str, str], rows: Iterable[dict], first_row_number: int
+) -> Iterator[tuple[int, MitigationCandidate]]:
+    for row_number, row in enumerate(rows, first_row_number):
+        candidate = load_row(field_mappings, row, row_number)
+
+        if candidate is not None:
+            yield row_number, candidate
+
+
+def row_dicts(field_names: list[str], rows: list[list[str]]) -> Iterator[dict]:
+    # The same dicts csv.DictReader would make, including None for missing trailing fields
+    for values in rows:
+        row = dict(zip(field_names, values))
+
+        for field_name in field_names[len(values) :]:
+            row[field_name] = None
+
+        yield row
+
+
+def parse_chunk(
     field_mappings: dict[str, str],
-    row,
-    row_number: int,
-    processed_flaws: list[str],
-):
-    def parse_bail(message):
-        console.log(f"Error on row {row_number}: {message}.")
-        exit(1)
+    field_names: list[str],
+    rows: list[list[str]],
+    first_row_number: int,
+) -> list[tuple]:
+    # Runs in a worker process. Plain tuples are several times cheaper to send back than candidates.
+    return [
+        (
+            row_number,
+            candidate.application_name,
+            candidate.sandbox_name,
+            candidate.cwe,
+            candidate.flaw_id,
+            candidate.mitigate_by_design,
+            candidate.false_positive,
+            candidate.accept_risk,
+            candidate.approve,
+            candidate.reject,
+        )
+        for row_number, candidate in parse_rows(
+            field_mappings, row_dicts(field_names, rows), first_row_number
+        )
+    ]
+
+
+def parse_chunks_in_parallel(
+    field_mappings: dict[str, str], file_data, number_of_processes: int
+) -> Iterator[tuple[int, MitigationCandidate]]:
+    # Splitting into rows is left to the csv module so quoting is handled exactly as when parsing sequentially
+    rows = csv.reader(file_data)
+    field_names = next(rows, [])
+    executor = ProcessPoolExecutor(number_of_processes)
+    pending = deque()
+
+    try:
+        for first_row_number, chunk in split_into_chunks(rows, 2):
+            pending.append(
+                executor.submit(
+                    parse_chunk, field_mappings, field_names, chunk, first_row_number
+                )
+            )
+
+            # Only read ahead far enough to keep every process busy, results are yielded in file order
+            if len(pending) >= number_of_processes * 2:
+                yield from build_candidates(pending.popleft().result())
+
+        while len(pending) > 0:
+            yield from build_candidates(pending.popleft().result())
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def build_candidates(
+    parsed_rows: list[tuple],
+) -> Iterator[tuple[int, MitigationCandidate]]:
+    for row_number, *fields in parsed_rows:
+        yield row_number, MitigationCandidate(*fields)
+
+
+def split_into_chunks(
+    rows: Iterable[list[str]], first_row_number: int
+) -> Iterator[tuple[int, list[list[str]]]]:
+    chunk = []
+
+    for row in rows:
+        # csv.DictReader skips empty lines without counting them as rows, so do the same
+        if len(row) < 1:
+            continue
+
+        chunk.append(row)
+
+        if len(chunk) >= PARSE_CHUNK_SIZE:
+            yield first_row_number, chunk
+            first_row_number = first_row_number + len(chunk)
+            chunk = []
+
+    if len(chunk) > 0:
+        yield first_row_number, chunk
 
-    def field_value_or_none(key):
-        if field_mappings[key] not in row:
-            return None
-        formatted = row[field_mappings[key]].strip()
 
-        return None if len(formatted) < 1 else formatted
+def field_value_or_none(field_mappings: dict[str, str], row, key: str) -> str:
+    if field_mappings[key] not in row:
+        return None
+    formatted = row[field_mappings[key]].strip()
 
+    return None if len(formatted) < 1 else formatted
+
+
+def load_row(
+    field_mappings: dict[str, str],
+    row,
+    row_number: int,
+) -> MitigationCandidate:
     application_name = row[field_mappings["application_name"]].strip()
 
     if len(application_name) < 1:
-        parse_bail("Application name is missing")
+        raise CsvRowError(row_number, "Application name is missing")
 
     sandbox_name = row[field_mappings["sandbox_name"]].strip()
 
@@ -81,20 +212,20 @@ def load_row(
         if cwe < 1 or cwe > 5000:
             raise
     except:
-        parse_bail("CWE is invalid")
+        raise CsvRowError(row_number, "CWE is invalid")
 
     try:
         flaw_id = int(row[field_mappings["flaw_id"]].strip())
         if flaw_id < 1:
             raise
     except:
-        parse_bail("Flaw ID is invalid")
+        raise CsvRowError(row_number, "Flaw ID is invalid")
 
-    mitigate_by_design = field_value_or_none("mitigate_by_design")
-    false_positive = field_value_or_none("false_positive")
-    accept_risk = field_value_or_none("accept_risk")
-    approve = field_value_or_none("approve")
-    reject = field_value_or_none("reject")
+    mitigate_by_design = field_value_or_none(field_mappings, row, "mitigate_by_design")
+    false_positive = field_value_or_none(field_mappings, row, "false_positive")
+    accept_risk = field_value_or_none(field_mappings, row, "accept_risk")
+    approve = field_value_or_none(field_mappings, row, "approve")
+    reject = field_value_or_none(field_mappings, row, "reject")
 
     # Ignore the row if there is no action to take
     if (
@@ -104,26 +235,31 @@ def load_row(
         and approve is None
         and reject is None
     ):
-        return
+        return None
 
     if mitigate_by_design is not None and false_positive is not None:
-        parse_bail(
+        raise CsvRowError(
+            row_number,
             'Cannot specify both "mitigate_by_design" and "false_positive"',
         )
 
     if approve is not None and reject is not None:
-        parse_bail('Cannot specify both "approve" and "reject"')
+        raise CsvRowError(row_number, 'Cannot specify both "approve" and "reject"')
 
     if false_positive is not None and reject is not None:
-        parse_bail('Cannot specify both "false_positive" and "reject"')
+        raise CsvRowError(
+            row_number, 'Cannot specify both "false_positive" and "reject"'
+        )
 
     if accept_risk is not None and reject is not None:
-        parse_bail('Cannot specify both "accept_risk" and "reject"')
+        raise CsvRowError(row_number, 'Cannot specify both "accept_risk" and "reject"')
 
     if mitigate_by_design is not None and reject is not None:
-        parse_bail('Cannot specify both "mitigate_by_design" and "reject"')
+        raise CsvRowError(
+            row_number, 'Cannot specify both "mitigate_by_design" and "reject"'
+        )
 
-    candidate = MitigationCandidate(
+    return MitigationCandidate(
         application_name,
         sandbox_name,
         cwe,
@@ -135,10 +271,18 @@ def load_row(
         reject,
     )
 
-    if candidate.flaw_key() in processed_flaws:
-        parse_bail(
-            f'Flaw ID {candidate.flaw_id} was detected on more than one row for application "{candidate.application_name}".',
+
+def check_for_duplicate_flaw(
+    candidate: MitigationCandidate,
+    row_number: int,
+    processed_flaws: dict[tuple[str, int], int],
+) -> None:
+    flaw_key = candidate.flaw_key
+
+    if flaw_key in processed_flaws:
+        raise CsvRowError(
+            row_number,
+            f'Flaw ID {candidate.flaw_id} was detected on more than one row for application "{candidate.application_name}" (also on row {processed_flaws[flaw_key]})',
         )
 
-    data.append(candidate)
-    processed_flaws.append(candidate.flaw_key())
+    processed_flaws[flaw_key] = row_number
@@ -0,0 +1,146 @@
+import unittest
+from io import StringIO
+from os import path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from rich.console import Console
+
+from utils.csv_parser import parse_csv
+
+mappings_file_path = "data/csv_field_mappings.csv"
+header = "App Name,Sandbox Name,CWE ID,Findings Flaw ID,Mitigate By Design,False Positive,Accept The Risk,Approve,Reject\n"
+
+
+def write_data_file(directory: str, rows: list[str], encoding="utf-8") -> str:
+    data_file_path = path.join(directory, "data.csv")
+
+    with open(data_file_path, "w", newline="", encoding=encoding) as data_file:
+        data_file.write(header)
+        data_file.writelines(rows)
+
+    return data_file_path
+
+
+class TestCsvParser(unittest.TestCase):
+    def test_parse_csv_with_bom(self):
+        with TemporaryDirectory() as directory:
+            data_file_path = write_data_file(
+                directory, ["abc,,78,291,ABC,,,,\n"], "utf-8-sig"
+            )
+
+            candidates = list(
+                parse_csv(Console(quiet=True), mappings_file_path, data_file_path)
+            )
+
+        self.assertEqual(1, len(candidates))
+        self.assertEqual("abc", candidates[0].application_name)
+        self.assertEqual(291, candidates[0].flaw_id)
+
+    def test_parse_csv_skips_rows_without_actions(self):
+        with TemporaryDirectory() as directory:
+            data_file_path = write_data_file(
+                directory, ["abc,,78,291,,,,,\n", "abc,sb,78,292,,,,OK,\n"]
+            )
+
+            candidates = list(
+                parse_csv(Console(quiet=True), mappings_file_path, data_file_path)
+            )
+
+        self.assertEqual(1, len(candidates))
+        self.assertEqual("sb", candidates[0].sandbox_name)
+        self.assertEqual("OK", candidates[0].approve)
+
+    def test_parse_csv_duplicate_flaw_reports_both_rows(self):
+        output = StringIO()
+
+        with TemporaryDirectory() as directory:
+            data_file_path = write_data_file(
+                directory,
+                [
+                    "abc,,78,291,ABC,,,,\n",
+                    "def,,78,291,ABC,,,,\n",
+                    "abc,,78,291,,X,,,\n",
+                ],
+            )
+
+            with self.assertRaises(SystemExit):
+                list(
+                    parse_csv(
+                        Console(file=output, width=200),
+                        mappings_file_path,
+                        data_file_path,
+                    )
+                )
+
+        self.assertIn("Error on row 4", output.getvalue())
+        self.assertIn("also on row 2", output.getvalue())
+
+    def test_parse_csv_many_rows(self):
+        row_count = 10_000
+
+        with TemporaryDirectory() as directory:
+            data_file_path = write_data_file(
+                directory,
+                [f"app {i % 100},,78,{i + 1},ABC,,,OK,\n" for i in range(row_count)],
+            )
+
+            candidates = list(
+                parse_csv(Console(quiet=True), mappings_file_path, data_file_path)
+            )
+
+        self.assertEqual(row_count, len(candidates))
+
+    @patch("utils.csv_parser.PARSE_CHUNK_SIZE", 3)
+    def test_parse_csv_in_parallel_matches_sequential(self):
+        rows = [f"app {i % 3},,78,{i + 1},ABC,,,OK,\n" for i in range(20)]
+        rows[4] = '"app 1",,78,5,"Multi\nline, with ""quotes""",,,OK,\n'
+        rows[7] = "\n"
+        rows[9] = "app 0,,78,10,,,,,\n"
+        rows[12] = 'app 0,,78,13,Input is 5" long,,,,\n'
+
+        with TemporaryDirectory() as directory:
+            data_file_path = write_data_file(directory, rows)
+
+            sequential = list(
+                parse_csv(Console(quiet=True), mappings_file_path, data_file_path)
+            )
+            parallel = list(
+                parse_csv(Console(quiet=True), mappings_file_path, data_file_path, 2)
+            )
+
+        self.assertEqual(18, len(parallel))
+        self.assertEqual(
+            [(c.application_name, c.flaw_id, c.mitigate_by_design) for c in sequential],
+            [(c.application_name, c.flaw_id, c.mitigate_by_design) for c in parallel],
+        )
+        self.assertEqual('Multi\nline, with "quotes"', parallel[4].mitigate_by_design)
+        self.assertEqual('Input is 5" long', parallel[10].mitigate_by_design)
+
+    @patch("utils.csv_parser.PARSE_CHUNK_SIZE", 2)
+    def test_parse_csv_in_parallel_reports_original_row_numbers(self):
+        output = StringIO()
+
+        with TemporaryDirectory() as directory:
+            data_file_path = write_data_file(
+                directory,
+                [
+                    "abc,,78,1,ABC,,,,\n",
+                    "abc,,78,2,ABC,,,,\n",
+                    "abc,,78,3,ABC,,,,\n",
+                    "abc,,78,1,,X,,,\n",
+                ],
+            )
+
+            with self.assertRaises(SystemExit):
+                list(
+                    parse_csv(
+                        Console(file=output, width=200),
+                        mappings_file_path,
+                        data_file_path,
+                        2,
+                    )
+                )
+
+        self.assertIn("Error on row 5", output.getvalue())
+        self.assertIn("also on row 2", output.getvalue())
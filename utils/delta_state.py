@@ -0,0 +1,89 @@
+from hashlib import blake2b
+from json import dump, load
+from os import replace
+from pathlib import Path
+
+from utils.mitigation_candidate import MitigationCandidate
+
+# The row's mitigations were applied by this tool
+OUTCOME_APPLIED = "applied"
+
+# The flaw's latest annotation was already the row's action, so there was nothing to apply
+OUTCOME_UP_TO_DATE = "up_to_date"
+
+
+def row_hash(candidate: MitigationCandidate) -> str:
+    # Everything the row asks for, so editing any of it makes the row new again
+    return blake2b(
+        repr(
+            (
+                candidate.application_name,
+                candidate.sandbox_name,
+                candidate.cwe,
+                candidate.flaw_id,
+                candidate.mitigate_by_design,
+                candidate.false_positive,
+                candidate.accept_risk,
+                candidate.approve,
+                candidate.reject,
+            )
+        ).encode("utf-8"),
+        digest_size=16,
+    ).hexdigest()
+
+
+class DeltaState:
+    """The outcome of each data file row dealt with by previous runs, so unchanged rows can be skipped."""
+
+    def __init__(self, file_path: str):
+        self._path = None if file_path is None else Path(file_path)
+        self._outcomes: dict[str, str] = {}
+        # Rows in this run's data file, anything else is dropped from the state when it is saved
+        self._seen: set[str] = set()
+
+        if self._path is not None and self._path.exists():
+            with self._path.open("r", encoding="utf-8") as state_file:
+                self._outcomes = load(state_file)
+
+    @property
+    def enabled(self) -> bool:
+        return self._path is not None
+
+    def is_settled(self, candidate: MitigationCandidate) -> bool:
+        """True if this exact row was dealt with by a previous run."""
+        if self._path is None:
+            return False
+
+        key = row_hash(candidate)
+        self._seen.add(key)
+
+        return key in self._outcomes
+
+    def record(self, candidate: MitigationCandidate, outcome: str) -> None:
+        if self._path is None:
+            return
+
+        key = row_hash(candidate)
+        self._seen.add(key)
+        self._outcomes[key] = outcome
+
+    def record_up_to_date(self, candidates: list[MitigationCandidate]) -> None:
+        # Rows that are not actionable yet, e.g. an approval before any proposal, are left to be tried again
+        for candidate in candidates:
+            if candidate.already_mitigated:
+                self.record(candidate, OUTCOME_UP_TO_DATE)
+
+    def save(self) -> None:
+        if self._path is None:
+            return
+
+        outcomes = {
+            key: outcome for key, outcome in self._outcomes.items() if key in self._seen
+        }
+        temporary_file_path = self._path.with_suffix(".tmp")
+
+        with temporary_file_path.open("w", encoding="utf-8") as state_file:
+            dump(outcomes, state_file)
+
+        # Swap the file in so an interrupted save never loses the previous state
+        replace(temporary_file_path, self._path)
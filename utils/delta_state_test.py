@@ -0,0 +1,166 @@
+import unittest
+from json import load
+from os import path
+from tempfile import TemporaryDirectory
+
+from rich.console import Console
+
+from utils.csv_parser import parse_csv
+from utils.csv_parser_test import mappings_file_path, write_data_file
+from utils.delta_state import OUTCOME_APPLIED, OUTCOME_UP_TO_DATE, DeltaState
+from utils.mitigation_candidate import MitigationCandidate
+from utils.processor import index_findings
+
+
+def finding(
+    flaw_id: int, status: str, resolution_status: str, annotations: list[dict]
+) -> dict:
+    return {
+        "issue_id": str(flaw_id),
+        "finding_details": {"cwe": {"id": "78"}},
+        "finding_status": {
+            "status": status,
+            "resolution": "UNRESOLVED",
+            "mitigation_review_status": "NONE",
+            "resolution_status": resolution_status,
+        },
+        "annotations": annotations,
+    }
+
+
+class TestDeltaState(unittest.TestCase):
+    def test_only_new_changed_and_unsettled_rows_are_processed(self):
+        with TemporaryDirectory() as directory:
+            state_file_path = path.join(directory, "state.json")
+            data_file_path = write_data_file(
+                directory,
+                [
+                    "abc,,78,1,ABC,,,,\n",
+                    "abc,,78,2,ABC,,,,\n",
+                    "abc,,78,3,ABC,,,,\n",
+                    "abc,,78,4,ABC,,,,\n",
+                ],
+            )
+
+            state = DeltaState(state_file_path)
+            candidates = list(
+                parse_csv(
+                    Console(quiet=True),
+                    mappings_file_path,
+                    data_file_path,
+                    skip_row=state.is_settled,
+                )
+            )
+            self.assertEqual(4, len(candidates))
+
+            # Flaw 3 was not found so it is left to be tried again
+            state.record(candidates[0], OUTCOME_APPLIED)
+            state.record(candidates[1], OUTCOME_UP_TO_DATE)
+            state.record(candidates[3], OUTCOME_APPLIED)
+            state.save()
+
+            # Flaw 4 now has a different comment and flaw 5 is new
+            data_file_path = write_data_file(
+                directory,
+                [
+                    "abc,,78,1,ABC,,,,\n",
+                    "abc,,78,2,ABC,,,,\n",
+                    "abc,,78,3,ABC,,,,\n",
+                    "abc,,78,4,DEF,,,,\n",
+                    "abc,,78,5,ABC,,,,\n",
+                ],
+            )
+
+            state = DeltaState(state_file_path)
+            candidates = list(
+                parse_csv(
+                    Console(quiet=True),
+                    mappings_file_path,
+                    data_file_path,
+                    skip_row=state.is_settled,
+                )
+            )
+            state.save()
+
+            self.assertEqual([3, 4, 5], [c.flaw_id for c in candidates])
+
+            # The old version of flaw 4 is gone from the data file so it is gone from the state
+            with open(state_file_path) as state_file:
+                outcomes = load(state_file)
+
+        self.assertEqual(
+            [OUTCOME_APPLIED, OUTCOME_UP_TO_DATE], sorted(outcomes.values())
+        )
+
+    def test_skipped_rows_still_count_as_duplicates(self):
+        with TemporaryDirectory() as directory:
+            state = DeltaState(path.join(directory, "state.json"))
+            data_file_path = write_data_file(directory, ["abc,,78,1,ABC,,,,\n"])
+            state.record(
+                next(
+                    parse_csv(Console(quiet=True), mappings_file_path, data_file_path)
+                ),
+                OUTCOME_APPLIED,
+            )
+
+            data_file_path = write_data_file(
+                directory, ["abc,,78,1,ABC,,,,\n", "abc,,78,1,DEF,,,,\n"]
+            )
+
+            with self.assertRaises(SystemExit):
+                list(
+                    parse_csv(
+                        Console(quiet=True),
+                        mappings_file_path,
+                        data_file_path,
+                        skip_row=state.is_settled,
+                    )
+                )
+
+    def test_only_already_mitigated_rows_are_up_to_date(self):
+        proposal = {
+            "action": "APPDESIGN",
+            "comment": "ABC",
+            "created": "2024-03-07T19:17:45.175Z",
+        }
+        already_proposed = MitigationCandidate(
+            "abc", None, 78, 1, "ABC", None, None, None, None
+        )
+        approve_before_proposal = MitigationCandidate(
+            "abc", None, 78, 2, None, None, None, "OK", None
+        )
+        reject_before_proposal = MitigationCandidate(
+            "abc", None, 78, 3, None, None, None, None, "No"
+        )
+        closed = MitigationCandidate("abc", None, 78, 4, "ABC", None, None, None, None)
+        candidates = [
+            already_proposed,
+            approve_before_proposal,
+            reject_before_proposal,
+            closed,
+        ]
+        findings_index = index_findings(
+            [
+                finding(1, "OPEN", "PROPOSED", [proposal]),
+                finding(2, "OPEN", "NONE", []),
+                finding(3, "OPEN", "NONE", []),
+                finding(4, "CLOSED", "NONE", []),
+            ]
+        )
+
+        for candidate in candidates:
+            candidate.populate_actions(findings_index)
+
+        with TemporaryDirectory() as directory:
+            state_file_path = path.join(directory, "state.json")
+            state = DeltaState(state_file_path)
+            state.record_up_to_date(candidates)
+            state.save()
+
+            reloaded = DeltaState(state_file_path)
+
+            self.assertEqual(
+                [True, False, False, False],
+                [reloaded.is_settled(c) for c in candidates],
+            )
+            self.assertTrue(all(len(c.actions) == 0 for c in candidates))
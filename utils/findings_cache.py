@@ -0,0 +1,90 @@
+from json import dump, load
+from os import replace
+from pathlib import Path
+from threading import Lock
+from time import time
+
+# Finding counts per scan, kept even after the findings expire, to schedule the biggest downloads first
+FINDING_COUNTS_FILE_NAME = "finding_counts.json"
+
+
+class FindingsCache:
+    def __init__(self, directory_path: str, ttl_seconds: int):
+        self._path = None if directory_path is None else Path(directory_path)
+        self._ttl_seconds = ttl_seconds
+        self._finding_counts: dict[str, int] = {}
+        self._lock = Lock()
+
+        if self._path is not None:
+            self._path.mkdir(parents=True, exist_ok=True)
+            self.load_finding_counts()
+
+    def load_finding_counts(self):
+        finding_counts_file_path = self._path / FINDING_COUNTS_FILE_NAME
+
+        if finding_counts_file_path.exists():
+            with finding_counts_file_path.open("r") as finding_counts_file:
+                self._finding_counts = load(finding_counts_file)
+
+    def get_finding_count(self, scan: tuple[str, str]) -> int:
+        """The number of findings the scan had when last downloaded, or None if it has not been seen."""
+        return self._finding_counts.get(self._scan_name(scan))
+
+    @property
+    def enabled(self) -> bool:
+        return self._path is not None
+
+    @staticmethod
+    def _scan_name(scan: tuple[str, str]) -> str:
+        application_guid, sandbox_guid = scan
+        return f"{application_guid}_{sandbox_guid}"
+
+    def _scan_file_path(self, scan: tuple[str, str]) -> Path:
+        return self._path / f"{self._scan_name(scan)}.json"
+
+    def get(self, scan: tuple[str, str]) -> list[dict]:
+        if self._path is None:
+            return None
+
+        scan_file_path = self._scan_file_path(scan)
+
+        if not scan_file_path.exists():
+            return None
+
+        with scan_file_path.open("r") as scan_file:
+            entry = load(scan_file)
+
+        # Stale findings would hide annotations added since they were cached
+        if time() - entry["cached_at"] > self._ttl_seconds:
+            return None
+
+        return entry["findings"]
+
+    def add(self, scan: tuple[str, str], findings: list[dict]) -> None:
+        if self._path is None:
+            return
+
+        scan_file_path = self._scan_file_path(scan)
+        temporary_file_path = scan_file_path.with_suffix(".tmp")
+
+        with temporary_file_path.open("w") as scan_file:
+            dump({"cached_at": time(), "findings": findings}, scan_file)
+
+        # Swap the file in so a reader never sees a partial write
+        replace(temporary_file_path, scan_file_path)
+
+        with self._lock:
+            self._finding_counts[self._scan_name(scan)] = len(findings)
+            finding_counts_file_path = self._path / FINDING_COUNTS_FILE_NAME
+            temporary_file_path = finding_counts_file_path.with_suffix(".tmp")
+
+            with temporary_file_path.open("w") as finding_counts_file:
+                dump(self._finding_counts, finding_counts_file)
+
+            replace(temporary_file_path, finding_counts_file_path)
+
+    def invalidate(self, scan: tuple[str, str]) -> None:
+        if self._path is None:
+            return
+
+        self._scan_file_path(scan).unlink(missing_ok=True)
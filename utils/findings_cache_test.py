@@ -0,0 +1,46 @@
+import unittest
+from tempfile import TemporaryDirectory
+
+from utils.findings_cache import FindingsCache
+
+scan = ("d67b6d7e-0d2a-427b-a9e1-a73ae5f34b36", None)
+findings = [{"issue_id": "1", "finding_details": {"cwe": {"id": "78"}}}]
+
+
+class TestFindingsCache(unittest.TestCase):
+    def test_cached_findings_are_returned(self):
+        with TemporaryDirectory() as directory:
+            FindingsCache(directory, 60).add(scan, findings)
+
+            self.assertEqual(findings, FindingsCache(directory, 60).get(scan))
+
+    def test_expired_findings_are_ignored(self):
+        with TemporaryDirectory() as directory:
+            cache = FindingsCache(directory, -1)
+            cache.add(scan, findings)
+
+            self.assertIsNone(cache.get(scan))
+
+    def test_invalidated_findings_are_removed(self):
+        with TemporaryDirectory() as directory:
+            cache = FindingsCache(directory, 60)
+            cache.add(scan, findings)
+            cache.invalidate(scan)
+
+            self.assertIsNone(cache.get(scan))
+
+    def test_no_cache_path(self):
+        cache = FindingsCache(None, 60)
+        cache.add(scan, findings)
+
+        self.assertIsNone(cache.get(scan))
+
+    def test_finding_counts_outlive_expired_findings(self):
+        with TemporaryDirectory() as directory:
+            FindingsCache(directory, -1).add(scan, findings)
+
+            cache = FindingsCache(directory, -1)
+
+            self.assertIsNone(cache.get(scan))
+            self.assertEqual(1, cache.get_finding_count(scan))
+            self.assertIsNone(cache.get_finding_count(("other", None)))
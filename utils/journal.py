@@ -0,0 +1,104 @@
+from json import dumps, loads
+from os import replace
+from pathlib import Path
+from threading import Lock
+
+from utils.mitigation_candidate import MitigationCandidate
+
+
+class MitigationJournal:
+    """An append-only record of the mitigations the API has acknowledged, so an interrupted run can be resumed."""
+
+    def __init__(self, file_path: str, resume: bool):
+        self._path = None if file_path is None else Path(file_path)
+        self._completed: set[tuple[str, str, int, str, str]] = set()
+        self._lock = Lock()
+        # A new run only replaces the previous journal once it has something of its own to record
+        self._started = resume
+
+        if self._path is None:
+            return
+
+        if resume:
+            self.load()
+
+    def load(self):
+        if not self._path.exists():
+            return
+
+        line = ""
+
+        with self._path.open("r", encoding="utf-8") as journal_file:
+            for line in journal_file:
+                # The last line can be partially written if the run was killed
+                try:
+                    entry = loads(line)
+                except ValueError:
+                    continue
+
+                self._completed.add(
+                    (
+                        entry["application_name"],
+                        entry["sandbox_name"],
+                        entry["flaw_id"],
+                        entry["action"],
+                        entry["comment"],
+                    )
+                )
+
+        # Terminate any partial last line so new entries start on their own line
+        if len(line) > 0 and not line.endswith("\n"):
+            with self._path.open("a", encoding="utf-8") as journal_file:
+                journal_file.write("\n")
+
+    def record(
+        self,
+        app_name_key: tuple[str, str],
+        flaw_ids: list[int],
+        action: str,
+        comment: str,
+    ) -> None:
+        if self._path is None:
+            return
+
+        application_name, sandbox_name = app_name_key
+        lines = [
+            dumps(
+                {
+                    "application_name": application_name,
+                    "sandbox_name": sandbox_name,
+                    "flaw_id": flaw_id,
+                    "action": action,
+                    "comment": comment,
+                }
+            )
+            + "\n"
+            for flaw_id in flaw_ids
+        ]
+
+        with self._lock:
+            if not self._started:
+                self.set_aside_previous_journal()
+                self._started = True
+
+            with self._path.open("a", encoding="utf-8") as journal_file:
+                journal_file.writelines(lines)
+
+    def set_aside_previous_journal(self) -> None:
+        # Kept rather than deleted in case the previous run was meant to be resumed
+        if self._path.exists():
+            replace(self._path, self.backup_file_path)
+
+    @property
+    def backup_file_path(self) -> Path:
+        return self._path.with_name(self._path.name + ".bak")
+
+    def is_complete(self, candidate: MitigationCandidate) -> bool:
+        """True if every action requested for this candidate has already been applied."""
+        application_name, sandbox_name = candidate.app_name_key
+
+        return all(
+            (application_name, sandbox_name, candidate.flaw_id, action, comment)
+            in self._completed
+            for action, comment in candidate.requested_actions.items()
+        )
@@ -0,0 +1,54 @@
+import unittest
+from os import path
+from tempfile import TemporaryDirectory
+
+from utils.journal import MitigationJournal
+from utils.mitigation_candidate import MitigationCandidate
+
+
+class TestMitigationJournal(unittest.TestCase):
+    def test_resume_skips_only_fully_applied_candidates(self):
+        applied = MitigationCandidate("abc", None, 1, 1, "x", None, None, "ok", None)
+        partially_applied = MitigationCandidate(
+            "abc", None, 1, 2, "x", None, None, "ok", None
+        )
+        changed_comment = MitigationCandidate(
+            "abc", None, 1, 3, "y", None, None, None, None
+        )
+
+        with TemporaryDirectory() as directory:
+            journal_file_path = path.join(directory, "journal.jsonl")
+            journal = MitigationJournal(journal_file_path, False)
+            journal.record(("abc", None), [1, 2, 3], "APPDESIGN", "x")
+            journal.record(("abc", None), [1], "ACCEPTED", "ok")
+
+            # Simulate being killed part way through writing a line
+            with open(journal_file_path, "a") as journal_file:
+                journal_file.write('{"application_name": "ab')
+
+            resumed = MitigationJournal(journal_file_path, True)
+
+            self.assertTrue(resumed.is_complete(applied))
+            self.assertFalse(resumed.is_complete(partially_applied))
+            self.assertFalse(resumed.is_complete(changed_comment))
+
+            resumed.record(("abc", None), [2], "ACCEPTED", "ok")
+            self.assertTrue(
+                MitigationJournal(journal_file_path, True).is_complete(
+                    partially_applied
+                )
+            )
+
+            # Starting again without resuming leaves the journal alone until something is applied
+            new_run = MitigationJournal(journal_file_path, False)
+            self.assertTrue(
+                MitigationJournal(journal_file_path, True).is_complete(applied)
+            )
+
+            new_run.record(("abc", None), [9], "APPDESIGN", "x")
+            self.assertFalse(
+                MitigationJournal(journal_file_path, True).is_complete(applied)
+            )
+            self.assertTrue(
+                MitigationJournal(new_run.backup_file_path, True).is_complete(applied)
+            )
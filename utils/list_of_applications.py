@@ -1,13 +1,23 @@
+from concurrent.futures import ThreadPoolExecutor
 from csv import reader as csv_reader, writer as csv_writer
 from pathlib import Path
+from sqlite3 import connect
 from rich.console import Console
-from utils.api import API
+from utils.api import API, APIError
 from utils.mitigation_candidate import MitigationCandidate
 from utils.parallel import parallel_execute_tasks_with_progress
 from threading import Lock
+from typing import Any, Callable
 
 
 class AppSandboxInfo:
+    __slots__ = (
+        "application_name",
+        "application_guid",
+        "sandbox_name",
+        "sandbox_guid",
+    )
+
     def __init__(
         self,
         application_name: str,
@@ -21,16 +31,25 @@ class AppSandboxInfo:
         self.sandbox_guid: str = sandbox_guid
 
 
-class ApplicationCache:
-    def __init__(self, file_path: str):
-        self._path = None if file_path is None else Path(file_path)
-        self._entries: list[AppSandboxInfo] = []
-        self._lock = Lock()
-        self.load()
+def app_sandbox_index_key(
+    application_name: str, sandbox_name: str = None
+) -> tuple[str, str]:
+    return (
+        application_name.strip().lower(),
+        None if sandbox_name is None else sandbox_name.strip().lower(),
+    )
 
-    def load(self):
-        if self._path is None:
-            return
+
+# Application caches with one of these extensions are kept in SQLite rather than CSV
+SQLITE_CACHE_SUFFIXES = [".db", ".sqlite", ".sqlite3"]
+
+
+class CsvApplicationCacheStore:
+    """Every entry is loaded up front. Fine for small caches and easy to edit by hand."""
+
+    def __init__(self, path: Path):
+        self._path = path
+        self._entries: dict[tuple[str, str], AppSandboxInfo] = {}
 
         if not self._path.exists():
             return
@@ -38,7 +57,7 @@ class ApplicationCache:
         with self._path.open("r") as cache_file:
             rows = csv_reader(cache_file)
             for row in rows:
-                self._entries.append(
+                self._index(
                     AppSandboxInfo(
                         row[0],
                         row[1],
@@ -47,39 +66,184 @@ class ApplicationCache:
                     )
                 )
 
-    def add(self, info: AppSandboxInfo) -> None:
-        if self._path is None:
-            return
+    def _index(self, info: AppSandboxInfo) -> None:
+        self._entries[
+            app_sandbox_index_key(info.application_name, info.sandbox_name)
+        ] = info
 
-        with self._lock:
-            with self._path.open("a") as cache_file:
-                writer = csv_writer(cache_file)
-                writer.writerow(
+    def entries(self) -> list[AppSandboxInfo]:
+        return list(self._entries.values())
+
+    def get(self, index_key: tuple[str, str]) -> AppSandboxInfo:
+        return self._entries.get(index_key)
+
+    def write(self, infos: list[AppSandboxInfo]) -> None:
+        with self._path.open("a") as cache_file:
+            writer = csv_writer(cache_file)
+            writer.writerows(
+                [
                     [
                         info.application_name,
                         info.application_guid,
                         info.sandbox_name,
                         info.sandbox_guid,
                     ]
+                    for info in infos
+                ]
+            )
+
+        for info in infos:
+            self._index(info)
+
+    def close(self) -> None:
+        pass
+
+
+class SqliteApplicationCacheStore:
+    """Looks entries up by primary key as they are needed, so large caches open instantly."""
+
+    def __init__(self, path: Path):
+        self._connection = connect(path)
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS applications (
+                application_key TEXT NOT NULL,
+                sandbox_key TEXT NOT NULL,
+                application_name TEXT NOT NULL,
+                application_guid TEXT NOT NULL,
+                sandbox_name TEXT,
+                sandbox_guid TEXT,
+                PRIMARY KEY (application_key, sandbox_key)
+            ) WITHOUT ROWID
+            """)
+
+    def get(self, index_key: tuple[str, str]) -> AppSandboxInfo:
+        application_key, sandbox_key = index_key
+
+        # A NULL would never match in the primary key, so no sandbox is stored as ""
+        row = self._connection.execute(
+            "SELECT application_name, application_guid, sandbox_name, sandbox_guid FROM applications WHERE application_key = ? AND sandbox_key = ?",
+            (application_key, sandbox_key or ""),
+        ).fetchone()
+
+        return None if row is None else AppSandboxInfo(*row)
+
+    def write(self, infos: list[AppSandboxInfo]) -> None:
+        rows = []
+
+        for info in infos:
+            application_key, sandbox_key = app_sandbox_index_key(
+                info.application_name, info.sandbox_name
+            )
+            rows.append(
+                (
+                    application_key,
+                    sandbox_key or "",
+                    info.application_name,
+                    info.application_guid,
+                    info.sandbox_name,
+                    info.sandbox_guid,
                 )
-                self._entries.append(info)
+            )
 
-    def get_by_app_key(self, app_key: str) -> AppSandboxInfo:
-        application_name, sandbox_name = app_key.split("§")
+        # One transaction for the lot
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO applications VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
 
-        if sandbox_name == str(None):
-            for entry in self._entries:
-                if entry.application_name == app_key:
-                    return entry
+    def close(self) -> None:
+        self._connection.close()
 
-        for entry in self._entries:
-            if (
-                entry.application_name == application_name
-                and entry.sandbox_name == sandbox_name
-            ):
-                return entry
 
-        return None
+class ApplicationCache:
+    def __init__(self, file_path: str):
+        self._store = None
+        # Entries resolved this run, written out together by flush()
+        self._pending: dict[tuple[str, str], AppSandboxInfo] = {}
+        self._lock = Lock()
+
+        if file_path is None:
+            return
+
+        path = Path(file_path)
+
+        if path.suffix.lower() not in SQLITE_CACHE_SUFFIXES:
+            self._store = CsvApplicationCacheStore(path)
+            return
+
+        is_new = not path.exists()
+        self._store = SqliteApplicationCacheStore(path)
+
+        # Carry over a CSV cache of the same name, e.g. "cache.csv" for "cache.db"
+        csv_path = path.with_suffix(".csv")
+
+        if is_new and csv_path.exists():
+            self._store.write(CsvApplicationCacheStore(csv_path).entries())
+
+    def add(self, info: AppSandboxInfo) -> None:
+        if self._store is None:
+            return
+
+        with self._lock:
+            self._pending[
+                app_sandbox_index_key(info.application_name, info.sandbox_name)
+            ] = info
+
+    def flush(self) -> None:
+        if self._store is None:
+            return
+
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending = {}
+
+        if len(pending) > 0:
+            self._store.write(pending)
+
+    def close(self) -> None:
+        if self._store is None:
+            return
+
+        self.flush()
+        self._store.close()
+
+    def get_by_app_key(self, app_key: tuple[str, str]) -> AppSandboxInfo:
+        if self._store is None:
+            return None
+
+        application_name, sandbox_name = app_key
+        index_key = app_sandbox_index_key(application_name, sandbox_name)
+
+        with self._lock:
+            pending = self._pending.get(index_key)
+
+        return pending if pending is not None else self._store.get(index_key)
+
+
+class SandboxDirectory:
+    """Lists each application's sandboxes at most once, however many threads ask for them."""
+
+    def __init__(self, api: API):
+        self._api = api
+        self._sandboxes: dict[str, dict[str, dict]] = {}
+        self._application_locks: dict[str, Lock] = {}
+        self._lock = Lock()
+
+    def get(self, application_guid: str) -> dict[str, dict]:
+        with self._lock:
+            application_lock = self._application_locks.setdefault(
+                application_guid, Lock()
+            )
+
+        # Other threads asking for the same application wait for the first listing
+        with application_lock:
+            if application_guid not in self._sandboxes:
+                self._sandboxes[application_guid] = {
+                    sandbox["name"].lower(): sandbox
+                    for sandbox in self._api.get_sandboxes(application_guid)
+                }
+
+            return self._sandboxes[application_guid]
 
 
 def load_applications_from_file(applications_file_path: str) -> list[str]:
@@ -102,23 +266,42 @@ def load_applications_from_file(applications_file_path: str) -> list[str]:
 def populate_app_details(
     candidates: list[MitigationCandidate], app_and_sandbox_guids: list[AppSandboxInfo]
 ):
+    application_guids: dict[str, str] = {}
+    sandboxes: dict[tuple[str, str], AppSandboxInfo] = {}
+
+    for i in app_and_sandbox_guids:
+        key = app_sandbox_index_key(i.application_name, i.sandbox_name)
+        application_guids[key[0]] = i.application_guid
+
+        if i.sandbox_name is not None:
+            sandboxes[key] = i
+
     for c in candidates:
-        for i in app_and_sandbox_guids:
-            if c.application_name.lower() != i.application_name.lower():
-                continue
+        key = app_sandbox_index_key(c.application_name, c.sandbox_name)
 
-            # If we are not using a sandbox then an application GUID is fine
-            if c.sandbox_name is None:
-                c.application_guid = i.application_guid
+        # If we are not using a sandbox then an application GUID is fine
+        if c.sandbox_name is None:
+            c.application_guid = application_guids.get(key[0])
+            continue
 
-            if i.sandbox_name is None:
-                continue
+        # If we have a sandbox then set both application GUID and sandbox GUID
+        # This way if we do not find the desired sandbox will not assume no-sandbox
+        sandbox = sandboxes.get(key)
 
-            # If we have a sandbox then set both application GUID and sandbox GUID
-            # This way if we do not find the desired sandbox will not assume no-sandbox
-            elif c.sandbox_name.lower() == i.sandbox_name.lower():
-                c.application_guid = i.application_guid
-                c.sandbox_guid = i.sandbox_guid
+        if sandbox is not None:
+            c.application_guid = sandbox.application_guid
+            c.sandbox_guid = sandbox.sandbox_guid
+
+
+def index_applications_by_name(applications) -> dict[str, list[dict]]:
+    applications_by_name: dict[str, list[dict]] = {}
+
+    for application in applications:
+        applications_by_name.setdefault(
+            application["profile"]["name"].lower(), []
+        ).append(application)
+
+    return applications_by_name
 
 
 def acquire_application_info(
@@ -127,74 +310,207 @@ def acquire_application_info(
     candidates: list[MitigationCandidate],
     application_cache_file_path: str,
     number_of_threads: int,
+    bulk_resolution_threshold: int,
+    on_resolved: Callable[[AppSandboxInfo], None] = None,
+    resolved_order: Callable[[AppSandboxInfo], Any] = None,
 ):
     cache = ApplicationCache(application_cache_file_path)
     app_and_sandbox_guids: list[AppSandboxInfo] = []
     app_keys_to_resolve = []
 
-    for app_key in set([c.app_name_key() for c in candidates]):
+    def add_app_info(info: AppSandboxInfo):
+        app_and_sandbox_guids.append(info)
+
+        # Lets later stages start on this application before the others are resolved
+        if on_resolved is not None:
+            on_resolved(info)
+
+    cached_app_infos: list[AppSandboxInfo] = []
+
+    for app_key in set([c.app_name_key for c in candidates]):
         cached = cache.get_by_app_key(app_key)
 
         if cached is not None:
-            app_and_sandbox_guids.append(cached)
+            cached_app_infos.append(cached)
         else:
             app_keys_to_resolve.append(app_key)
 
-    if len(app_keys_to_resolve) > 0:
+    # These are all known up front, so hand them on in the order the caller wants to work on them
+    if resolved_order is not None:
+        cached_app_infos.sort(key=resolved_order)
 
-        def resolve_application_guid(app_key: str):
-            application_name, sandbox_name = app_key.split("§")
-            applications = []
+    for info in cached_app_infos:
+        add_app_info(info)
 
-            # The API can return results for similar named applications
-            applications_to_consider = api.get_applications_by_name(application_name)
+    if len(app_keys_to_resolve) < 1:
+        cache.close()
+        populate_app_details(candidates, app_and_sandbox_guids)
+        return
 
-            for application in applications_to_consider:
-                if application["profile"]["name"].lower() == application_name.lower():
-                    applications.append(application)
+    # The same application can be needed for its policy scan and several sandboxes
+    application_names: dict[str, str] = {}
+    sandboxes_needed: dict[str, list[str]] = {}
 
-            if len(applications) < 1:
-                console.log(
-                    f'Skipping not found app profile named: "{application_name}". Make sure this application name has been entered fully and correctly.'
-                )
-                return
+    for app_key in app_keys_to_resolve:
+        application_name, sandbox_name = app_key
+        application_names.setdefault(application_name.lower(), application_name)
 
-            if len(applications) > 1:
-                console.log(
-                    f'Skipping ambiguous app profile named: "{application_name}". Make sure this application name has been entered fully and correctly.'
-                )
-                return
+        if sandbox_name is not None:
+            sandboxes_needed.setdefault(application_name.lower(), []).append(
+                sandbox_name
+            )
 
-            application_guid = applications[0]["guid"]
+    newly_resolved: list[AppSandboxInfo] = []
+    sandbox_directory = SandboxDirectory(api)
 
-            # Add the application policy
-            app_info = AppSandboxInfo(
-                application_name,
-                application_guid,
+    def resolved(info: AppSandboxInfo):
+        newly_resolved.append(info)
+        add_app_info(info)
+
+    def resolve_application(application_name_key: str, applications: list[dict]):
+        application_name = application_names[application_name_key]
+
+        if len(applications) < 1:
+            console.log(
+                f'Skipping not found app profile named: "{application_name}". Make sure this application name has been entered fully and correctly.'
+            )
+            return
+
+        if len(applications) > 1:
+            console.log(
+                f'Skipping ambiguous app profile named: "{application_name}". Make sure this application name has been entered fully and correctly.'
+            )
+            return
+
+        # Add the application policy
+        app_info = AppSandboxInfo(application_name, applications[0]["guid"])
+        resolved(app_info)
+
+        # Sandboxes are only listed for applications whose rows name one
+        for sandbox_name in sandboxes_needed.get(application_name_key, []):
+            sandbox = sandbox_directory.get(app_info.application_guid).get(
+                sandbox_name.lower()
             )
 
-            app_and_sandbox_guids.append(app_info)
-            cache.add(app_info)
+            if sandbox is None:
+                console.log(
+                    f'Skipping not found sandbox named: "{sandbox_name}" in app profile "{application_name}".'
+                )
+                continue
 
-            for sandbox in api.get_sandboxes(application_guid):
-                app_info = AppSandboxInfo(
+            resolved(
+                AppSandboxInfo(
                     application_name,
-                    application_guid,
+                    app_info.application_guid,
                     sandbox["name"],
                     sandbox["guid"],
                 )
+            )
+
+    application_name_keys_to_find = list(application_names.keys())
+    ambiguous_application_name_keys: set[str] = set()
+
+    if len(application_names) >= bulk_resolution_threshold:
+        console.log("Listing all application profiles...")
+        listed: dict[str, list[dict]] = {}
+
+        def resolve_listed_application(
+            application_name_key: str, applications: list[dict]
+        ):
+            try:
+                resolve_application(application_name_key, applications)
+            except APIError as err:
+                console.log(f"Error: {err}")
+            except Exception:
+                console.print_exception()
+
+        try:
+            with ThreadPoolExecutor(max_workers=number_of_threads) as pool:
+                for application in api.get_all_applications():
+                    application_name_key = application["profile"]["name"].lower()
+
+                    if application_name_key not in application_names:
+                        continue
+
+                    listed.setdefault(application_name_key, []).append(application)
+
+                    # Start on each application as soon as it is listed rather than after the last page
+                    if len(listed[application_name_key]) == 1:
+                        pool.submit(
+                            resolve_listed_application,
+                            application_name_key,
+                            [application],
+                        )
+
+            application_name_keys_to_find = []
+
+            for application_name_key in application_names:
+                if application_name_key not in listed:
+                    resolve_application(application_name_key, [])
+        except APIError as err:
+            console.log(
+                f"Error: {err}. Falling back to looking up each application by name."
+            )
+            application_name_keys_to_find = [
+                k for k in application_names if k not in listed
+            ]
+
+        # A second profile with the same name can come after the first was already started on
+        for application_name_key, applications in listed.items():
+            if len(applications) > 1:
+                ambiguous_application_name_keys.add(application_name_key)
+                console.log(
+                    f'Skipping ambiguous app profile named: "{application_names[application_name_key]}". Make sure this application name has been entered fully and correctly.'
+                )
+
+    if len(application_name_keys_to_find) > 0:
 
-                app_and_sandbox_guids.append(app_info)
-                cache.add(app_info)
+        def find_application(application_name_key: str):
+            # The API can return results for similar named applications
+            applications_by_name = index_applications_by_name(
+                api.get_applications_by_name(application_names[application_name_key])
+            )
+            resolve_application(
+                application_name_key,
+                applications_by_name.get(application_name_key, []),
+            )
 
-        application_count_pluralised = "" if len(app_keys_to_resolve) == 1 else "s"
+        application_count_pluralised = (
+            "" if len(application_name_keys_to_find) == 1 else "s"
+        )
 
         parallel_execute_tasks_with_progress(
             console,
-            f"Identifying {len(app_keys_to_resolve)} application{application_count_pluralised}...",
-            resolve_application_guid,
-            app_keys_to_resolve,
+            f"Identifying {len(application_name_keys_to_find)} application{application_count_pluralised}...",
+            find_application,
+            application_name_keys_to_find,
             number_of_threads,
         )
 
+    if len(ambiguous_application_name_keys) > 0:
+        app_and_sandbox_guids = [
+            i
+            for i in app_and_sandbox_guids
+            if i.application_name.lower() not in ambiguous_application_name_keys
+        ]
+        newly_resolved = [
+            i
+            for i in newly_resolved
+            if i.application_name.lower() not in ambiguous_application_name_keys
+        ]
+
+        # These may already have been handed on, so take back their GUIDs
+        for candidate in candidates:
+            if (
+                candidate.application_name.strip().lower()
+                in ambiguous_application_name_keys
+            ):
+                candidate.application_guid = None
+                candidate.sandbox_guid = None
+
+    # Everything resolved this run is written in one go
+    for info in newly_resolved:
+        cache.add(info)
+
+    cache.close()
     populate_app_details(candidates, app_and_sandbox_guids)
@@ -1,9 +1,60 @@
 import unittest
+from os import path
+from tempfile import TemporaryDirectory
+from threading import Event
 
-from utils.list_of_applications import AppSandboxInfo, populate_app_details
+from rich.console import Console
+
+from utils.list_of_applications import (
+    AppSandboxInfo,
+    ApplicationCache,
+    acquire_application_info,
+    populate_app_details,
+)
 from utils.mitigation_candidate import MitigationCandidate
 
 
+class FakeAPI:
+    def __init__(self, applications: list[dict], sandboxes: dict[str, list[dict]]):
+        self.applications = applications
+        self.sandboxes = sandboxes
+        self.calls: list[str] = []
+
+    def get_all_applications(self):
+        self.calls.append("get_all_applications")
+        return iter(self.applications)
+
+    def get_applications_by_name(self, application_name: str):
+        self.calls.append(f"get_applications_by_name:{application_name}")
+        return [
+            a
+            for a in self.applications
+            if application_name.lower() in a["profile"]["name"].lower()
+        ]
+
+    def get_sandboxes(self, application_guid: str):
+        self.calls.append(f"get_sandboxes:{application_guid}")
+        return self.sandboxes.get(application_guid, [])
+
+
+fake_applications = [
+    {"guid": "guid-a", "profile": {"name": "App A"}},
+    {"guid": "guid-a2", "profile": {"name": "App A 2"}},
+    {"guid": "guid-b", "profile": {"name": "App B"}},
+]
+
+fake_sandboxes = {"guid-b": [{"name": "Dev", "guid": "sandbox-b"}]}
+
+
+def candidates_for_acquire() -> list[MitigationCandidate]:
+    return [
+        MitigationCandidate("app a", None, 1, 1, None, None, None, None, None),
+        MitigationCandidate("App B", "dev", 1, 2, None, None, None, None, None),
+        MitigationCandidate("App B", "Missing", 1, 4, None, None, None, None, None),
+        MitigationCandidate("Missing", None, 1, 3, None, None, None, None, None),
+    ]
+
+
 class TestListOfApplications(unittest.TestCase):
     def test_populate_app_details_app_has_sandbox(self):
         application_name = "abc"
@@ -44,3 +95,159 @@ class TestListOfApplications(unittest.TestCase):
 
         self.assertEqual(application_guid, candidates[0].application_guid)
         self.assertEqual(None, candidates[0].sandbox_guid)
+
+    def test_populate_app_details_is_case_insensitive(self):
+        application_guid = "d67b6d7e-0d2a-427b-a9e1-a73ae5f34b36"
+        sandbox_guid = "1236bcd3-0ee6-46a3-9493-73e920a4e953"
+
+        candidates = [
+            MitigationCandidate("ABC", "Sandbox", 1, 1, None, None, None, None, None),
+            MitigationCandidate("abc", "missing", 1, 2, None, None, None, None, None),
+        ]
+
+        app_infos = [
+            AppSandboxInfo("abc", application_guid),
+            AppSandboxInfo("abc", application_guid, "sandbox", sandbox_guid),
+        ]
+
+        populate_app_details(candidates, app_infos)
+
+        self.assertEqual(application_guid, candidates[0].application_guid)
+        self.assertEqual(sandbox_guid, candidates[0].sandbox_guid)
+        self.assertEqual(None, candidates[1].application_guid)
+        self.assertEqual(None, candidates[1].sandbox_guid)
+
+    def test_application_cache_lookup(self):
+        application_guid = "d67b6d7e-0d2a-427b-a9e1-a73ae5f34b36"
+        sandbox_guid = "1236bcd3-0ee6-46a3-9493-73e920a4e953"
+
+        with TemporaryDirectory() as directory:
+            cache_file_path = path.join(directory, "cache.csv")
+            cache = ApplicationCache(cache_file_path)
+            cache.add(AppSandboxInfo("abc", application_guid))
+            cache.add(AppSandboxInfo("abc", application_guid, "123", sandbox_guid))
+            cache.close()
+
+            reloaded = ApplicationCache(cache_file_path)
+
+            self.assertEqual(
+                application_guid,
+                reloaded.get_by_app_key(("ABC", None)).application_guid,
+            )
+            self.assertEqual(
+                sandbox_guid, reloaded.get_by_app_key(("abc", "123")).sandbox_guid
+            )
+            self.assertIsNone(reloaded.get_by_app_key(("abc", "456")))
+
+    def test_sqlite_application_cache_lookup(self):
+        with TemporaryDirectory() as directory:
+            cache_file_path = path.join(directory, "cache.db")
+            cache = ApplicationCache(cache_file_path)
+            cache.add(AppSandboxInfo("abc", "guid-a"))
+            cache.add(AppSandboxInfo("abc", "guid-a", "123", "sandbox-a"))
+
+            # Entries are readable before they are written
+            self.assertEqual(
+                "guid-a", cache.get_by_app_key(("abc", None)).application_guid
+            )
+            cache.close()
+
+            reloaded = ApplicationCache(cache_file_path)
+            application = reloaded.get_by_app_key(("ABC", None))
+            sandbox = reloaded.get_by_app_key(("abc", " 123 "))
+            missing = reloaded.get_by_app_key(("abc", "456"))
+            reloaded.close()
+
+        self.assertEqual("guid-a", application.application_guid)
+        self.assertIsNone(application.sandbox_guid)
+        self.assertEqual("sandbox-a", sandbox.sandbox_guid)
+        self.assertIsNone(missing)
+
+    def test_sqlite_application_cache_migrates_csv_cache(self):
+        with TemporaryDirectory() as directory:
+            csv_cache = ApplicationCache(path.join(directory, "cache.csv"))
+            csv_cache.add(AppSandboxInfo("abc", "guid-a", "123", "sandbox-a"))
+            csv_cache.close()
+
+            cache = ApplicationCache(path.join(directory, "cache.db"))
+            sandbox = cache.get_by_app_key(("abc", "123"))
+            cache.close()
+
+        self.assertEqual("sandbox-a", sandbox.sandbox_guid)
+
+    def test_acquire_application_info_by_name(self):
+        api = FakeAPI(fake_applications, fake_sandboxes)
+        candidates = candidates_for_acquire()
+
+        acquire_application_info(Console(quiet=True), api, candidates, None, 1, 100)
+
+        self.assertEqual("guid-a", candidates[0].application_guid)
+        self.assertEqual("guid-b", candidates[1].application_guid)
+        self.assertEqual("sandbox-b", candidates[1].sandbox_guid)
+        self.assertIsNone(candidates[2].application_guid)
+        self.assertNotIn("get_all_applications", api.calls)
+        self.assertNotIn("get_sandboxes:guid-a", api.calls)
+
+    def test_acquire_application_info_in_bulk(self):
+        api = FakeAPI(fake_applications, fake_sandboxes)
+        candidates = candidates_for_acquire()
+
+        acquire_application_info(Console(quiet=True), api, candidates, None, 1, 2)
+
+        self.assertEqual("guid-a", candidates[0].application_guid)
+        self.assertEqual("guid-b", candidates[1].application_guid)
+        self.assertEqual("sandbox-b", candidates[1].sandbox_guid)
+        self.assertIsNone(candidates[2].application_guid)
+        self.assertEqual(["get_all_applications", "get_sandboxes:guid-b"], api.calls)
+
+    def test_acquire_application_info_does_not_wait_for_slow_applications(self):
+        resolved_fast = Event()
+
+        class SlowAPI(FakeAPI):
+            def get_applications_by_name(self, application_name: str):
+                # Only answers once the other application has been handed on
+                if application_name.lower() == "app a":
+                    self.calls.append(f"waited:{resolved_fast.wait(5)}")
+
+                return super().get_applications_by_name(application_name)
+
+        def on_resolved(info: AppSandboxInfo):
+            if info.application_guid == "guid-b":
+                resolved_fast.set()
+
+        api = SlowAPI(fake_applications, fake_sandboxes)
+
+        acquire_application_info(
+            Console(quiet=True),
+            api,
+            candidates_for_acquire()[:2],
+            None,
+            2,
+            100,
+            on_resolved,
+        )
+
+        self.assertIn("waited:True", api.calls)
+
+    def test_acquire_application_info_in_bulk_takes_back_ambiguous_applications(self):
+        api = FakeAPI(
+            fake_applications + [{"guid": "guid-b2", "profile": {"name": "app b"}}],
+            fake_sandboxes,
+        )
+        candidates = candidates_for_acquire()
+        handed_on: list[str] = []
+
+        acquire_application_info(
+            Console(quiet=True),
+            api,
+            candidates,
+            None,
+            1,
+            2,
+            lambda info: handed_on.append(info.application_guid),
+        )
+
+        self.assertEqual("guid-a", candidates[0].application_guid)
+        self.assertIsNone(candidates[1].application_guid)
+        self.assertIsNone(candidates[1].sandbox_guid)
+        self.assertIn("guid-b", handed_on)
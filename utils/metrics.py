@@ -0,0 +1,125 @@
+from contextlib import contextmanager
+from json import dumps
+from re import compile as compile_regex
+from threading import Lock
+from time import perf_counter
+
+GUID_PATTERN = compile_regex(
+    r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"
+)
+
+PERCENTILES = [50, 95, 99]
+
+
+def endpoint_name(method: str, uri: str) -> str:
+    # Group calls by endpoint rather than by application
+    return f"{method} {GUID_PATTERN.sub('{guid}', uri)}"
+
+
+def percentile(sorted_values: list[float], percent: int) -> float:
+    if len(sorted_values) < 1:
+        return 0.0
+
+    # Nearest-rank
+    rank = max(1, -(-percent * len(sorted_values) // 100))
+    return sorted_values[rank - 1]
+
+
+class Metrics:
+    def __init__(self):
+        self._latencies: dict[str, list[float]] = {}
+        self._errors: dict[str, int] = {}
+        self._retries: dict[str, int] = {}
+        self._back_off_seconds = 0.0
+        self._phases: dict[str, float] = {}
+        self._lock = Lock()
+
+    def record_request(self, endpoint: str, seconds: float, succeeded: bool):
+        with self._lock:
+            self._latencies.setdefault(endpoint, []).append(seconds)
+
+            if not succeeded:
+                self._errors[endpoint] = self._errors.get(endpoint, 0) + 1
+
+    def record_retry(self, endpoint: str):
+        with self._lock:
+            self._retries[endpoint] = self._retries.get(endpoint, 0) + 1
+
+    def record_back_off(self, seconds: float):
+        with self._lock:
+            self._back_off_seconds = self._back_off_seconds + seconds
+
+    @contextmanager
+    def phase(self, name: str):
+        started = perf_counter()
+
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._phases[name] = self._phases.get(name, 0.0) + (
+                    perf_counter() - started
+                )
+
+    def summary(self) -> dict:
+        with self._lock:
+            endpoints = {}
+
+            for endpoint, latencies in self._latencies.items():
+                sorted_latencies = sorted(latencies)
+                endpoints[endpoint] = {
+                    "calls": len(latencies),
+                    "errors": self._errors.get(endpoint, 0),
+                    "retries": self._retries.get(endpoint, 0),
+                    **{
+                        f"p{percent}_seconds": percentile(sorted_latencies, percent)
+                        for percent in PERCENTILES
+                    },
+                }
+
+            return {
+                "endpoints": endpoints,
+                "back_off_seconds": self._back_off_seconds,
+                "phase_seconds": dict(self._phases),
+            }
+
+    def to_prometheus(self) -> str:
+        summary = self.summary()
+        lines = [
+            "# TYPE csv_mitigator_api_calls_total counter",
+            "# TYPE csv_mitigator_api_errors_total counter",
+            "# TYPE csv_mitigator_api_retries_total counter",
+            "# TYPE csv_mitigator_api_latency_seconds summary",
+        ]
+
+        for endpoint, stats in summary["endpoints"].items():
+            label = f'endpoint="{endpoint}"'
+            lines.append(f"csv_mitigator_api_calls_total{{{label}}} {stats['calls']}")
+            lines.append(f"csv_mitigator_api_errors_total{{{label}}} {stats['errors']}")
+            lines.append(
+                f"csv_mitigator_api_retries_total{{{label}}} {stats['retries']}"
+            )
+
+            for percent in PERCENTILES:
+                lines.append(
+                    f'csv_mitigator_api_latency_seconds{{{label},quantile="{percent / 100}"}} {stats[f"p{percent}_seconds"]}'
+                )
+
+        lines.append("# TYPE csv_mitigator_back_off_seconds_total counter")
+        lines.append(
+            f"csv_mitigator_back_off_seconds_total {summary['back_off_seconds']}"
+        )
+        lines.append("# TYPE csv_mitigator_phase_seconds gauge")
+
+        for phase, seconds in summary["phase_seconds"].items():
+            lines.append(f'csv_mitigator_phase_seconds{{phase="{phase}"}} {seconds}')
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, file_path: str):
+        # Prometheus text format for ".prom" files, JSON otherwise
+        with open(file_path, "w", encoding="utf-8") as metrics_file:
+            if file_path.endswith(".prom"):
+                metrics_file.write(self.to_prometheus())
+            else:
+                metrics_file.write(dumps(self.summary(), indent=4))
@@ -0,0 +1,43 @@
+import unittest
+
+from utils.metrics import Metrics, endpoint_name, percentile
+
+
+class TestMetrics(unittest.TestCase):
+    def test_endpoint_name_groups_by_guid(self):
+        self.assertEqual(
+            "GET appsec/v2/applications/{guid}/findings",
+            endpoint_name(
+                "GET",
+                "appsec/v2/applications/d67b6d7e-0d2a-427b-a9e1-a73ae5f34b36/findings",
+            ),
+        )
+
+    def test_percentile(self):
+        values = [float(i) for i in range(1, 101)]
+
+        self.assertEqual(50, percentile(values, 50))
+        self.assertEqual(95, percentile(values, 95))
+        self.assertEqual(0, percentile([], 99))
+
+    def test_summary(self):
+        metrics = Metrics()
+        metrics.record_request("GET a", 0.1, True)
+        metrics.record_request("GET a", 0.3, False)
+        metrics.record_retry("GET a")
+        metrics.record_back_off(1.5)
+
+        with metrics.phase("parse"):
+            pass
+
+        summary = metrics.summary()
+
+        self.assertEqual(2, summary["endpoints"]["GET a"]["calls"])
+        self.assertEqual(1, summary["endpoints"]["GET a"]["errors"])
+        self.assertEqual(1, summary["endpoints"]["GET a"]["retries"])
+        self.assertEqual(0.3, summary["endpoints"]["GET a"]["p99_seconds"])
+        self.assertEqual(1.5, summary["back_off_seconds"])
+        self.assertIn("parse", summary["phase_seconds"])
+        self.assertIn(
+            'csv_mitigator_api_calls_total{endpoint="GET a"} 2', metrics.to_prometheus()
+        )
@@ -1,8 +1,44 @@
-from utils.time import parse_from_veracode_date_time
-from collections import OrderedDict
+from utils.time import veracode_date_time_sort_key
+
+# There is a specific order in which to apply multiple mitigation actions
+ACTION_ORDER = ["APPDESIGN", "FP", "ACCEPTRISK", "ACCEPTED", "REJECTED"]
+
+# The candidate field holding the comment for each action
+ACTION_FIELDS = {
+    "APPDESIGN": "mitigate_by_design",
+    "FP": "false_positive",
+    "ACCEPTRISK": "accept_risk",
+    "ACCEPTED": "approve",
+    "REJECTED": "reject",
+}
+
+ACTION_FLAGS = {action: 1 << index for index, action in enumerate(ACTION_ORDER)}
+
+# Stands in for the last annotation of a finding that has none
+NO_ANNOTATION = {"action": "", "comment": ""}
 
 
 class MitigationCandidate:
+    # There can be millions of candidates, so avoid a __dict__ per instance
+    __slots__ = (
+        "application_name",
+        "_application_guid",
+        "sandbox_name",
+        "_sandbox_guid",
+        "cwe",
+        "flaw_id",
+        "mitigate_by_design",
+        "false_positive",
+        "accept_risk",
+        "approve",
+        "reject",
+        "_action_flags",
+        "already_mitigated",
+        "_app_name_key",
+        "_app_guid_key",
+        "_flaw_key",
+    )
+
     def __init__(
         self,
         application_name: str,
@@ -16,9 +52,9 @@ class MitigationCandidate:
         reject: str,
     ):
         self.application_name = application_name
-        self.application_guid = None
+        self._application_guid = None
         self.sandbox_name = sandbox_name
-        self.sandbox_guid = None
+        self._sandbox_guid = None
         self.cwe = cwe
         self.flaw_id = flaw_id
         self.mitigate_by_design = mitigate_by_design
@@ -26,16 +62,73 @@ class MitigationCandidate:
         self.accept_risk = accept_risk
         self.approve = approve
         self.reject = reject
-        self.actions = OrderedDict()
+        # One bit per action to take, the comments already live in the fields above
+        self._action_flags = 0
+        # Every requested action is already the flaw's latest annotation, as opposed to not being actionable yet
+        self.already_mitigated = False
+
+        # Keys are looked up in tight loops so they are built once, on first use
+        self._app_name_key = None
+        self._app_guid_key = None
+        self._flaw_key = None
+
+    @property
+    def actions(self) -> dict[str, str]:
+        return {
+            action: getattr(self, ACTION_FIELDS[action])
+            for action in ACTION_ORDER
+            if self._action_flags & ACTION_FLAGS[action]
+        }
+
+    @property
+    def requested_actions(self) -> dict[str, str]:
+        return {
+            action: getattr(self, ACTION_FIELDS[action])
+            for action in ACTION_ORDER
+            if getattr(self, ACTION_FIELDS[action]) is not None
+        }
 
-    def app_name_key(self) -> str:
-        return f"{self.application_name.strip()}§{None if self.sandbox_name is None else self.sandbox_name.strip()}"
+    @property
+    def application_guid(self) -> str:
+        return self._application_guid
 
-    def app_guid_key(self) -> str:
-        return f"{self.application_guid}§{self.sandbox_guid}"
+    @application_guid.setter
+    def application_guid(self, application_guid: str):
+        self._application_guid = application_guid
+        self._app_guid_key = None
 
-    def flaw_key(self) -> str:
-        return f"{self.application_name.strip()}§{self.flaw_id}"
+    @property
+    def sandbox_guid(self) -> str:
+        return self._sandbox_guid
+
+    @sandbox_guid.setter
+    def sandbox_guid(self, sandbox_guid: str):
+        self._sandbox_guid = sandbox_guid
+        self._app_guid_key = None
+
+    @property
+    def app_name_key(self) -> tuple[str, str]:
+        if self._app_name_key is None:
+            self._app_name_key = (
+                self.application_name.strip(),
+                None if self.sandbox_name is None else self.sandbox_name.strip(),
+            )
+
+        return self._app_name_key
+
+    @property
+    def app_guid_key(self) -> tuple[str, str]:
+        if self._app_guid_key is None:
+            self._app_guid_key = (self.application_guid, self.sandbox_guid)
+
+        return self._app_guid_key
+
+    @property
+    def flaw_key(self) -> tuple[str, int]:
+        if self._flaw_key is None:
+            self._flaw_key = (self.application_name.strip(), self.flaw_id)
+
+        return self._flaw_key
 
     def get_formatted_actions_to_perform(self):
         formatted_action_names = {
@@ -47,25 +140,25 @@ class MitigationCandidate:
         }
 
         return ", ".join(
-            [formatted_action_names[action] for action in self.actions.keys()]
+            [formatted_action_names[action] for action in self.actions]
         ).strip()
 
-    def find_matching_flaw(self, findings: dict):
-        for finding in findings:
-            if int(finding["finding_details"]["cwe"]["id"]) != self.cwe:
-                continue
-
-            if int(finding["issue_id"]) != self.flaw_id:
-                continue
+    def find_matching_flaw(self, findings_index: dict[tuple[int, int], dict]):
+        return findings_index.get((self.flaw_id, self.cwe))
 
-            return finding
-
-    def populate_actions(self, findings: dict):
-        finding = self.find_matching_flaw(findings)
+    def populate_actions(self, findings_index: dict[tuple[int, int], dict]):
+        finding = self.find_matching_flaw(findings_index)
 
         if not finding:
             return
 
+        last_annotation = self.get_last_annotation(finding)
+        self.already_mitigated = all(
+            last_annotation["action"] == action
+            and last_annotation["comment"] == comment
+            for action, comment in self.requested_actions.items()
+        )
+
         status = finding["finding_status"]
 
         # Only check the status if we are not rejecting
@@ -97,41 +190,26 @@ class MitigationCandidate:
             if status["resolution_status"] in ["REJECTED", "NONE"]:
                 return
 
-        last_annotation = self.get_last_annotation(finding)
-
-        # There is a specific order in which to apply multiple mitigation actions
-        if self.mitigate_by_design is not None:
-            self.add_action("APPDESIGN", self.mitigate_by_design, last_annotation)
-
-        if self.false_positive is not None:
-            self.add_action("FP", self.false_positive, last_annotation)
+        for action in self.requested_actions:
+            self.add_action(action, last_annotation)
 
-        if self.accept_risk is not None:
-            self.add_action("ACCEPTRISK", self.accept_risk, last_annotation)
-
-        if self.approve is not None:
-            self.add_action("ACCEPTED", self.approve, last_annotation)
-
-        if self.reject is not None:
-            self.add_action("REJECTED", self.reject, last_annotation)
-
-    def add_action(self, action: str, comment: str, last_annotation):
+    def add_action(self, action: str, last_annotation):
         # Was this already mitigated?
-        if (
-            last_annotation["action"] == action
-            and last_annotation["comment"] == comment
-        ):
+        if last_annotation["action"] == action and last_annotation[
+            "comment"
+        ] == getattr(self, ACTION_FIELDS[action]):
             return
 
-        self.actions[action] = comment
+        self._action_flags = self._action_flags | ACTION_FLAGS[action]
 
     @staticmethod
     def get_last_annotation(finding):
-        if "annotations" in finding:
-            return sorted(
-                finding["annotations"],
-                key=lambda x: parse_from_veracode_date_time(x["created"]),
-                reverse=True,
-            )[0]
-
-        return {"action": "", "comment": ""}
+        # Several candidates can share a finding, so only work this out once
+        if "last_annotation" not in finding:
+            finding["last_annotation"] = max(
+                finding.get("annotations", []),
+                key=lambda x: veracode_date_time_sort_key(x["created"]),
+                default=NO_ANNOTATION,
+            )
+
+        return finding["last_annotation"]
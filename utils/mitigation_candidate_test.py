@@ -1,5 +1,6 @@
 import unittest
 from utils.mitigation_candidate import MitigationCandidate
+from utils.processor import index_findings
 
 mitigation_text = "text_text_text"
 mitigation_text_2 = "text_text_text"
@@ -14,15 +15,18 @@ class TestMitigationCandidate(unittest.TestCase):
         )
 
         candidate.populate_actions(
-            [
-                {
-                    "finding_details": {"cwe": {"id": str(cwe)}},
-                    "issue_id": "990",
-                }
-            ]
+            index_findings(
+                [
+                    {
+                        "finding_details": {"cwe": {"id": str(cwe)}},
+                        "issue_id": "990",
+                    }
+                ]
+            )
         )
 
         self.assertEqual(0, len(candidate.actions))
+        self.assertFalse(candidate.already_mitigated)
 
     def test_no_matching_flaw_by_cwe(self):
         candidate = MitigationCandidate(
@@ -30,12 +34,14 @@ class TestMitigationCandidate(unittest.TestCase):
         )
 
         candidate.populate_actions(
-            [
-                {
-                    "finding_details": {"cwe": {"id": "88"}},
-                    "issue_id": str(flaw_id),
-                }
-            ]
+            index_findings(
+                [
+                    {
+                        "finding_details": {"cwe": {"id": "88"}},
+                        "issue_id": str(flaw_id),
+                    }
+                ]
+            )
         )
 
         self.assertEqual(0, len(candidate.actions))
@@ -46,48 +52,77 @@ class TestMitigationCandidate(unittest.TestCase):
         )
 
         candidate.populate_actions(
-            [
-                {
-                    "finding_details": {"cwe": {"id": str(cwe)}},
-                    "issue_id": str(flaw_id),
-                    "finding_status": {
-                        "status": "OPEN",
-                        "resolution": "UNRESOLVED",
-                        "mitigation_review_status": "NONE",
-                        "resolution_status": "NONE",
-                    },
-                }
-            ]
+            index_findings(
+                [
+                    {
+                        "finding_details": {"cwe": {"id": str(cwe)}},
+                        "issue_id": str(flaw_id),
+                        "finding_status": {
+                            "status": "OPEN",
+                            "resolution": "UNRESOLVED",
+                            "mitigation_review_status": "NONE",
+                            "resolution_status": "NONE",
+                        },
+                    }
+                ]
+            )
         )
 
         self.assertEqual(1, len(candidate.actions))
         self.assertEqual(mitigation_text, candidate.actions["APPDESIGN"])
 
+    def test_closed_flaw_is_not_already_mitigated(self):
+        candidate = MitigationCandidate(
+            "", "", cwe, flaw_id, mitigation_text, None, None, None, None
+        )
+
+        candidate.populate_actions(
+            index_findings(
+                [
+                    {
+                        "finding_details": {"cwe": {"id": str(cwe)}},
+                        "issue_id": str(flaw_id),
+                        "finding_status": {
+                            "status": "CLOSED",
+                            "resolution": "MITIGATED",
+                            "mitigation_review_status": "NONE",
+                            "resolution_status": "APPROVED",
+                        },
+                    }
+                ]
+            )
+        )
+
+        self.assertEqual(0, len(candidate.actions))
+        self.assertFalse(candidate.already_mitigated)
+
     def test_update_existing_mitigate_by_design(self):
         candidate = MitigationCandidate(
             "", "", cwe, flaw_id, mitigation_text, None, None, None, None
         )
 
         candidate.populate_actions(
-            [
-                {
-                    "finding_details": {"cwe": {"id": str(cwe)}},
-                    "issue_id": str(flaw_id),
-                    "finding_status": {
-                        "status": "OPEN",
-                        "resolution": "UNRESOLVED",
-                        "mitigation_review_status": "NONE",
-                        "resolution_status": "PROPOSED",
-                    },
-                    "annotations": [
-                        {
-                            "comment": "text",
-                            "action": "APPDESIGN",
-                            "created": "2023-03-07T19:17:45.175Z",
+            index_findings(
+                [
+                    {
+                        "finding_details": {"cwe": {"id": str(cwe)}},
+                        "issue_id": str(flaw_id),
+                        "finding_status": {
+                            "status": "OPEN",
+                            "resolution": "UNRESOLVED",
+                            "mitigation_review_status": "NONE",
+                            "resolution_status": "PROPOSED",
                         },
-                    ],
-                }
-            ]
+                        "annotations": [
+                            {
+                                "comment": "text",
+                                "action": "APPDESIGN",
+                                "created": "2023-03-07T19:17:45.175Z",
+                            },
+                        ],
+                    }
+                ]
+            )
         )
 
         self.assertEqual(1, len(candidate.actions))
@@ -99,25 +134,27 @@ class TestMitigationCandidate(unittest.TestCase):
         )
 
         candidate.populate_actions(
-            [
-                {
-                    "finding_details": {"cwe": {"id": str(cwe)}},
-                    "issue_id": str(flaw_id),
-                    "finding_status": {
-                        "status": "OPEN",
-                        "resolution": "UNRESOLVED",
-                        "mitigation_review_status": "NONE",
-                        "resolution_status": "PROPOSED",
-                    },
-                    "annotations": [
-                        {
-                            "comment": mitigation_text,
-                            "action": "APPDESIGN",
-                            "created": "2023-03-07T19:17:45.175Z",
+            index_findings(
+                [
+                    {
+                        "finding_details": {"cwe": {"id": str(cwe)}},
+                        "issue_id": str(flaw_id),
+                        "finding_status": {
+                            "status": "OPEN",
+                            "resolution": "UNRESOLVED",
+                            "mitigation_review_status": "NONE",
+                            "resolution_status": "PROPOSED",
                         },
-                    ],
-                }
-            ]
+                        "annotations": [
+                            {
+                                "comment": mitigation_text,
+                                "action": "APPDESIGN",
+                                "created": "2023-03-07T19:17:45.175Z",
+                            },
+                        ],
+                    }
+                ]
+            )
         )
 
         self.assertEqual(0, len(candidate.actions))
@@ -129,18 +166,20 @@ class TestMitigationCandidate(unittest.TestCase):
 
         # Same as if MBD proposed?
         candidate.populate_actions(
-            [
-                {
-                    "finding_details": {"cwe": {"id": str(cwe)}},
-                    "issue_id": str(flaw_id),
-                    "finding_status": {
-                        "status": "OPEN",
-                        "resolution": "UNRESOLVED",
-                        "mitigation_review_status": "NONE",
-                        "resolution_status": "PROPOSED",
-                    },
-                }
-            ]
+            index_findings(
+                [
+                    {
+                        "finding_details": {"cwe": {"id": str(cwe)}},
+                        "issue_id": str(flaw_id),
+                        "finding_status": {
+                            "status": "OPEN",
+                            "resolution": "UNRESOLVED",
+                            "mitigation_review_status": "NONE",
+                            "resolution_status": "PROPOSED",
+                        },
+                    }
+                ]
+            )
         )
 
         self.assertEqual(
@@ -155,18 +194,20 @@ class TestMitigationCandidate(unittest.TestCase):
         )
 
         candidate.populate_actions(
-            [
-                {
-                    "finding_details": {"cwe": {"id": str(cwe)}},
-                    "issue_id": str(flaw_id),
-                    "finding_status": {
-                        "status": "OPEN",
-                        "resolution": "UNRESOLVED",
-                        "mitigation_review_status": "NONE",
-                        "resolution_status": "NONE",
-                    },
-                }
-            ]
+            index_findings(
+                [
+                    {
+                        "finding_details": {"cwe": {"id": str(cwe)}},
+                        "issue_id": str(flaw_id),
+                        "finding_status": {
+                            "status": "OPEN",
+                            "resolution": "UNRESOLVED",
+                            "mitigation_review_status": "NONE",
+                            "resolution_status": "NONE",
+                        },
+                    }
+                ]
+            )
         )
 
         self.assertEqual(2, len(candidate.actions))
@@ -185,18 +226,20 @@ class TestMitigationCandidate(unittest.TestCase):
         )
 
         candidate.populate_actions(
-            [
-                {
-                    "finding_details": {"cwe": {"id": str(cwe)}},
-                    "issue_id": str(flaw_id),
-                    "finding_status": {
-                        "status": "OPEN",
-                        "resolution": "UNRESOLVED",
-                        "mitigation_review_status": "NONE",
-                        "resolution_status": "NONE",
-                    },
-                }
-            ]
+            index_findings(
+                [
+                    {
+                        "finding_details": {"cwe": {"id": str(cwe)}},
+                        "issue_id": str(flaw_id),
+                        "finding_status": {
+                            "status": "OPEN",
+                            "resolution": "UNRESOLVED",
+                            "mitigation_review_status": "NONE",
+                            "resolution_status": "NONE",
+                        },
+                    }
+                ]
+            )
         )
 
         self.assertEqual(2, len(candidate.actions))
@@ -215,18 +258,20 @@ class TestMitigationCandidate(unittest.TestCase):
         )
 
         candidate.populate_actions(
-            [
-                {
-                    "finding_details": {"cwe": {"id": str(cwe)}},
-                    "issue_id": str(flaw_id),
-                    "finding_status": {
-                        "status": "OPEN",
-                        "resolution": "UNRESOLVED",
-                        "mitigation_review_status": "NONE",
-                        "resolution_status": "NONE",
-                    },
-                }
-            ]
+            index_findings(
+                [
+                    {
+                        "finding_details": {"cwe": {"id": str(cwe)}},
+                        "issue_id": str(flaw_id),
+                        "finding_status": {
+                            "status": "OPEN",
+                            "resolution": "UNRESOLVED",
+                            "mitigation_review_status": "NONE",
+                            "resolution_status": "NONE",
+                        },
+                    }
+                ]
+            )
         )
 
         self.assertEqual(2, len(candidate.actions))
@@ -245,25 +290,27 @@ class TestMitigationCandidate(unittest.TestCase):
         )
 
         candidate.populate_actions(
-            [
-                {
-                    "finding_details": {"cwe": {"id": str(cwe)}},
-                    "issue_id": str(flaw_id),
-                    "finding_status": {
-                        "status": "OPEN",
-                        "resolution": "UNRESOLVED",
-                        "mitigation_review_status": "NONE",
-                        "resolution_status": "PROPOSED",
-                    },
-                    "annotations": [
-                        {
-                            "comment": "text",
-                            "action": "APPDESIGN",
-                            "created": "2023-03-07T19:17:45.175Z",
+            index_findings(
+                [
+                    {
+                        "finding_details": {"cwe": {"id": str(cwe)}},
+                        "issue_id": str(flaw_id),
+                        "finding_status": {
+                            "status": "OPEN",
+                            "resolution": "UNRESOLVED",
+                            "mitigation_review_status": "NONE",
+                            "resolution_status": "PROPOSED",
                         },
-                    ],
-                }
-            ]
+                        "annotations": [
+                            {
+                                "comment": "text",
+                                "action": "APPDESIGN",
+                                "created": "2023-03-07T19:17:45.175Z",
+                            },
+                        ],
+                    }
+                ]
+            )
         )
 
         self.assertEqual(1, len(candidate.actions))
@@ -275,25 +322,27 @@ class TestMitigationCandidate(unittest.TestCase):
         )
 
         candidate.populate_actions(
-            [
-                {
-                    "finding_details": {"cwe": {"id": str(cwe)}},
-                    "issue_id": str(flaw_id),
-                    "finding_status": {
-                        "status": "CLOSED",
-                        "resolution": "MITIGATED",
-                        "mitigation_review_status": "NONE",
-                        "resolution_status": "APPROVED",
-                    },
-                    "annotations": [
-                        {
-                            "comment": "text",
-                            "action": "APPDESIGN",
-                            "created": "2023-03-07T19:17:45.175Z",
+            index_findings(
+                [
+                    {
+                        "finding_details": {"cwe": {"id": str(cwe)}},
+                        "issue_id": str(flaw_id),
+                        "finding_status": {
+                            "status": "CLOSED",
+                            "resolution": "MITIGATED",
+                            "mitigation_review_status": "NONE",
+                            "resolution_status": "APPROVED",
                         },
-                    ],
-                }
-            ]
+                        "annotations": [
+                            {
+                                "comment": "text",
+                                "action": "APPDESIGN",
+                                "created": "2023-03-07T19:17:45.175Z",
+                            },
+                        ],
+                    }
+                ]
+            )
         )
 
         self.assertEqual(1, len(candidate.actions))
@@ -305,25 +354,27 @@ class TestMitigationCandidate(unittest.TestCase):
         )
 
         candidate.populate_actions(
-            [
-                {
-                    "finding_details": {"cwe": {"id": str(cwe)}},
-                    "issue_id": str(flaw_id),
-                    "finding_status": {
-                        "status": "OPEN",
-                        "resolution": "UNRESOLVED",
-                        "mitigation_review_status": "NONE",
-                        "resolution_status": "PROPOSED",
-                    },
-                    "annotations": [
-                        {
-                            "comment": "text",
-                            "action": "APPDESIGN",
-                            "created": "2023-03-07T19:17:45.175Z",
+            index_findings(
+                [
+                    {
+                        "finding_details": {"cwe": {"id": str(cwe)}},
+                        "issue_id": str(flaw_id),
+                        "finding_status": {
+                            "status": "OPEN",
+                            "resolution": "UNRESOLVED",
+                            "mitigation_review_status": "NONE",
+                            "resolution_status": "PROPOSED",
                         },
-                    ],
-                }
-            ]
+                        "annotations": [
+                            {
+                                "comment": "text",
+                                "action": "APPDESIGN",
+                                "created": "2023-03-07T19:17:45.175Z",
+                            },
+                        ],
+                    }
+                ]
+            )
         )
 
         self.assertEqual(1, len(candidate.actions))
@@ -335,25 +386,27 @@ class TestMitigationCandidate(unittest.TestCase):
         )
 
         candidate.populate_actions(
-            [
-                {
-                    "finding_details": {"cwe": {"id": str(cwe)}},
-                    "issue_id": str(flaw_id),
-                    "finding_status": {
-                        "status": "OPEN",
-                        "resolution": "UNRESOLVED",
-                        "mitigation_review_status": "NONE",
-                        "resolution_status": "REJECTED",
-                    },
-                    "annotations": [
-                        {
-                            "comment": "text",
-                            "action": "REJECTED",
-                            "created": "2023-03-07T19:17:45.175Z",
+            index_findings(
+                [
+                    {
+                        "finding_details": {"cwe": {"id": str(cwe)}},
+                        "issue_id": str(flaw_id),
+                        "finding_status": {
+                            "status": "OPEN",
+                            "resolution": "UNRESOLVED",
+                            "mitigation_review_status": "NONE",
+                            "resolution_status": "REJECTED",
                         },
-                    ],
-                }
-            ]
+                        "annotations": [
+                            {
+                                "comment": "text",
+                                "action": "REJECTED",
+                                "created": "2023-03-07T19:17:45.175Z",
+                            },
+                        ],
+                    }
+                ]
+            )
         )
 
         self.assertEqual(0, len(candidate.actions))
@@ -364,18 +417,20 @@ class TestMitigationCandidate(unittest.TestCase):
         )
 
         candidate.populate_actions(
-            [
-                {
-                    "finding_details": {"cwe": {"id": str(cwe)}},
-                    "issue_id": str(flaw_id),
-                    "finding_status": {
-                        "status": "OPEN",
-                        "resolution": "UNRESOLVED",
-                        "mitigation_review_status": "NONE",
-                        "resolution_status": "NONE",
-                    },
-                }
-            ]
+            index_findings(
+                [
+                    {
+                        "finding_details": {"cwe": {"id": str(cwe)}},
+                        "issue_id": str(flaw_id),
+                        "finding_status": {
+                            "status": "OPEN",
+                            "resolution": "UNRESOLVED",
+                            "mitigation_review_status": "NONE",
+                            "resolution_status": "NONE",
+                        },
+                    }
+                ]
+            )
         )
 
         self.assertEqual(0, len(candidate.actions))
@@ -386,18 +441,20 @@ class TestMitigationCandidate(unittest.TestCase):
         )
 
         candidate.populate_actions(
-            [
-                {
-                    "finding_details": {"cwe": {"id": str(cwe)}},
-                    "issue_id": str(flaw_id),
-                    "finding_status": {
-                        "status": "OPEN",
-                        "resolution": "UNRESOLVED",
-                        "mitigation_review_status": "NONE",
-                        "resolution_status": "NONE",
-                    },
-                }
-            ]
+            index_findings(
+                [
+                    {
+                        "finding_details": {"cwe": {"id": str(cwe)}},
+                        "issue_id": str(flaw_id),
+                        "finding_status": {
+                            "status": "OPEN",
+                            "resolution": "UNRESOLVED",
+                            "mitigation_review_status": "NONE",
+                            "resolution_status": "NONE",
+                        },
+                    }
+                ]
+            )
         )
 
         self.assertEqual(0, len(candidate.actions))
@@ -408,18 +465,61 @@ class TestMitigationCandidate(unittest.TestCase):
         )
 
         candidate.populate_actions(
-            [
-                {
-                    "finding_details": {"cwe": {"id": str(cwe)}},
-                    "issue_id": str(flaw_id),
-                    "finding_status": {
-                        "status": "CLOSED",
-                        "resolution": "MITIGATED",
-                        "mitigation_review_status": "deviates",
-                        "resolution_status": "APPROVED",
-                    },
-                }
-            ]
+            index_findings(
+                [
+                    {
+                        "finding_details": {"cwe": {"id": str(cwe)}},
+                        "issue_id": str(flaw_id),
+                        "finding_status": {
+                            "status": "CLOSED",
+                            "resolution": "MITIGATED",
+                            "mitigation_review_status": "deviates",
+                            "resolution_status": "APPROVED",
+                        },
+                    }
+                ]
+            )
         )
 
         self.assertEqual(0, len(candidate.actions))
+
+    def test_actions_are_in_the_order_to_apply_them(self):
+        candidate = MitigationCandidate(
+            "", "", cwe, flaw_id, None, None, None, "approve", None
+        )
+        candidate.add_action("ACCEPTED", {"action": "", "comment": ""})
+        candidate.accept_risk = "risk"
+        candidate.add_action("ACCEPTRISK", {"action": "", "comment": ""})
+
+        self.assertEqual(["ACCEPTRISK", "ACCEPTED"], list(candidate.actions))
+        self.assertFalse(hasattr(candidate, "__dict__"))
+
+    def test_keys(self):
+        candidate = MitigationCandidate(
+            " app ", " sandbox ", cwe, flaw_id, mitigation_text, None, None, None, None
+        )
+
+        self.assertEqual(("app", "sandbox"), candidate.app_name_key)
+        self.assertEqual(("app", flaw_id), candidate.flaw_key)
+        self.assertEqual((None, None), candidate.app_guid_key)
+
+        candidate.application_guid = "a"
+        candidate.sandbox_guid = "b"
+
+        self.assertEqual(("a", "b"), candidate.app_guid_key)
+
+    def test_get_last_annotation(self):
+        finding = {
+            "annotations": [
+                {"comment": "a", "action": "FP", "created": "2023-03-07T19:17:45.2Z"},
+                {"comment": "b", "action": "FP", "created": "2023-03-07T19:17:45.175Z"},
+                {"comment": "c", "action": "FP", "created": "2022-12-07T19:17:45.999Z"},
+            ]
+        }
+
+        self.assertEqual(
+            "a", MitigationCandidate.get_last_annotation(finding)["comment"]
+        )
+        self.assertEqual(
+            {"action": "", "comment": ""}, MitigationCandidate.get_last_annotation({})
+        )
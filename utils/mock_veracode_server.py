@@ -0,0 +1,257 @@
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps, loads
+from re import compile as compile_regex
+from secrets import SystemRandom
+from threading import Lock, Thread
+from time import sleep
+from urllib.parse import parse_qs, unquote, urlparse
+from uuid import uuid4
+
+APPLICATIONS_PATH = compile_regex(r"^/appsec/v1/applications$")
+SANDBOXES_PATH = compile_regex(r"^/appsec/v1/applications/([^/]+)/sandboxes$")
+FINDINGS_PATH = compile_regex(r"^/appsec/v2/applications/([^/]+)/findings$")
+ANNOTATIONS_PATH = compile_regex(r"^/appsec/v2/applications/([^/]+)/annotations$")
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# The resolution status a flaw moves to after each annotation action
+RESOLUTION_STATUSES = {
+    "APPDESIGN": "PROPOSED",
+    "FP": "PROPOSED",
+    "ACCEPTRISK": "PROPOSED",
+    "ACCEPTED": "APPROVED",
+    "REJECTED": "REJECTED",
+}
+
+
+def application_name(index: int) -> str:
+    return f"App {index}"
+
+
+def sandbox_name(index: int) -> str:
+    return f"Sandbox {index}"
+
+
+def finding_cwe(issue_id: int) -> int:
+    return 79 + issue_id % 5
+
+
+def veracode_now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+class MockVeracodeDataset:
+    """Applications, sandboxes and open SAST findings, generated to a given size."""
+
+    def __init__(
+        self,
+        number_of_applications: int,
+        sandboxes_per_application: int,
+        findings_per_scan: int,
+    ):
+        self.applications: list[dict] = []
+        self.sandboxes: dict[str, list[dict]] = {}
+        self.findings: dict[tuple[str, str], list[dict]] = {}
+        self.lock = Lock()
+
+        for application_index in range(number_of_applications):
+            application_guid = str(uuid4())
+            self.applications.append(
+                {
+                    "guid": application_guid,
+                    "profile": {"name": application_name(application_index)},
+                }
+            )
+
+            self.sandboxes[application_guid] = [
+                {"guid": str(uuid4()), "name": sandbox_name(sandbox_index)}
+                for sandbox_index in range(sandboxes_per_application)
+            ]
+
+            for sandbox_guid in [None] + [
+                s["guid"] for s in self.sandboxes[application_guid]
+            ]:
+                self.findings[(application_guid, sandbox_guid)] = [
+                    {
+                        "issue_id": issue_id,
+                        "scan_type": "STATIC",
+                        "finding_details": {
+                            "cwe": {"id": finding_cwe(issue_id)},
+                            "file_path": f"src/module_{issue_id}.py",
+                        },
+                        "finding_status": {
+                            "status": "OPEN",
+                            "resolution": "UNRESOLVED",
+                            "mitigation_review_status": "NONE",
+                            "resolution_status": "NONE",
+                        },
+                    }
+                    for issue_id in range(1, findings_per_scan + 1)
+                ]
+
+    def annotate(
+        self, scan: tuple[str, str], issue_ids: set[int], action: str, comment: str
+    ) -> bool:
+        findings = self.findings.get(scan)
+
+        if findings is None:
+            return False
+
+        with self.lock:
+            for finding in findings:
+                if finding["issue_id"] not in issue_ids:
+                    continue
+
+                finding.setdefault("annotations", []).append(
+                    {"action": action, "comment": comment, "created": veracode_now()}
+                )
+                status = finding["finding_status"]
+                status["resolution_status"] = RESOLUTION_STATUSES[action]
+
+                if action == "ACCEPTED":
+                    status["status"] = "CLOSED"
+                    status["resolution"] = "MITIGATED"
+                elif action == "REJECTED":
+                    status["status"] = "OPEN"
+                    status["resolution"] = "UNRESOLVED"
+
+        return True
+
+
+class MockVeracodeServer:
+    """A local stand-in for the Veracode REST endpoints this tool calls, with configurable latency and errors."""
+
+    def __init__(
+        self,
+        dataset: MockVeracodeDataset,
+        latency_seconds: float = 0,
+        error_rate: float = 0,
+    ):
+        self.dataset = dataset
+        self.latency_seconds = latency_seconds
+        self.error_rate = error_rate
+        self.random = SystemRandom()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, as the real API supports it
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                server.handle(self, "GET")
+
+            def do_POST(self):
+                server.handle(self, "POST")
+
+        return Handler
+
+    def handle(self, request: BaseHTTPRequestHandler, method: str):
+        url = urlparse(request.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        length = int(request.headers.get("Content-Length", 0))
+        body = request.rfile.read(length) if length > 0 else b""
+
+        if self.latency_seconds > 0:
+            sleep(self.latency_seconds)
+
+        if self.error_rate > 0 and self.random.random() < self.error_rate:
+            return self.respond(request, 503, {"message": "Service Unavailable"})
+
+        if method == "GET" and APPLICATIONS_PATH.match(url.path):
+            applications = self.dataset.applications
+
+            if "name" in query:
+                # The client percent-encodes the name before it is encoded into the query string
+                name = unquote(query["name"]).lower()
+                applications = [
+                    a for a in applications if name in a["profile"]["name"].lower()
+                ]
+
+            return self.respond_paged(request, query, "applications", applications)
+
+        if method == "GET" and (match := SANDBOXES_PATH.match(url.path)):
+            sandboxes = self.dataset.sandboxes.get(match.group(1))
+
+            if sandboxes is None:
+                return self.respond(request, 404, {"message": "Not Found"})
+
+            return self.respond_paged(request, query, "sandboxes", sandboxes)
+
+        if method == "GET" and (match := FINDINGS_PATH.match(url.path)):
+            findings = self.dataset.findings.get((match.group(1), query.get("context")))
+
+            if findings is None:
+                return self.respond(request, 404, {"message": "Not Found"})
+
+            if "cwe" in query:
+                cwes = set(int(cwe) for cwe in query["cwe"].split(","))
+                findings = [
+                    f for f in findings if f["finding_details"]["cwe"]["id"] in cwes
+                ]
+
+            with self.dataset.lock:
+                return self.respond_paged(request, query, "findings", findings)
+
+        if method == "POST" and (match := ANNOTATIONS_PATH.match(url.path)):
+            annotation = loads(body)
+            issue_ids = set(int(i) for i in annotation["issue_list"].split(","))
+
+            if not self.dataset.annotate(
+                (match.group(1), query.get("context")),
+                issue_ids,
+                annotation["action"],
+                annotation["comment"],
+            ):
+                return self.respond(request, 404, {"message": "Not Found"})
+
+            return self.respond(request, 200, {"findings_annotated": len(issue_ids)})
+
+        return self.respond(request, 404, {"message": "Not Found"})
+
+    @staticmethod
+    def respond_paged(
+        request: BaseHTTPRequestHandler, query: dict, element: str, items: list
+    ):
+        size = min(MAX_PAGE_SIZE, int(query.get("size", DEFAULT_PAGE_SIZE)))
+        page = int(query.get("page", 0))
+        total_pages = -(-len(items) // size)
+        page_items = items[page * size : (page + 1) * size]
+        data = {"page": {"number": page, "size": size, "total_pages": total_pages}}
+
+        # Like the real API, "_embedded" is left out when there is nothing to return
+        if len(page_items) > 0:
+            data["_embedded"] = {element: page_items}
+
+        MockVeracodeServer.respond(request, 200, data)
+
+    @staticmethod
+    def respond(request: BaseHTTPRequestHandler, status: int, data: dict):
+        content = dumps(data).encode("utf-8")
+        request.send_response(status)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(content)))
+        request.end_headers()
+        request.wfile.write(content)
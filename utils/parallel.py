@@ -1,20 +1,34 @@
+from asyncio import Semaphore, gather
 from concurrent.futures import ThreadPoolExecutor
 
 from rich.console import Console
 from rich.progress import Progress
 
+from utils.api import APIError
+
 
 def parallel_execute_tasks_with_progress(
-    console: Console, name, function_to_execute, tasks, max_threads=10
-):
+    console: Console, name, function_to_execute, tasks, max_threads=10, cost=None
+) -> list:
+    failed_tasks = []
+
+    # Start the most expensive tasks first so one of them does not become the tail of the run
+    if cost is not None:
+        tasks = sorted(tasks, key=cost, reverse=True)
+
     with Progress(console=console) as progress:
         progress_task_id = progress.add_task(name, total=len(tasks))
 
         def worker_process_progress_wrapper(function_to_execute, task):
             try:
                 function_to_execute(task)
+            except APIError as err:
+                # The API has already been retried, so report this task and carry on with the others
+                console.log(f"Error: {err}")
+                failed_tasks.append(task)
             except Exception:
                 console.print_exception()
+                failed_tasks.append(task)
 
             progress.advance(progress_task_id)
 
@@ -30,3 +44,44 @@ def parallel_execute_tasks_with_progress(
             # Wait for the threads to complete
             for future in futures:
                 future.result()
+
+    if len(failed_tasks) > 0:
+        console.log(f"{len(failed_tasks)} of {len(tasks)} tasks failed.")
+
+    return failed_tasks
+
+
+async def async_execute_tasks_with_progress(
+    console: Console, name, coroutine_to_execute, tasks, max_concurrency=100, cost=None
+) -> list:
+    failed_tasks = []
+
+    # Start the most expensive tasks first so one of them does not become the tail of the run
+    if cost is not None:
+        tasks = sorted(tasks, key=cost, reverse=True)
+
+    slots = Semaphore(max_concurrency)
+
+    with Progress(console=console) as progress:
+        progress_task_id = progress.add_task(name, total=len(tasks))
+
+        async def task_progress_wrapper(task):
+            async with slots:
+                try:
+                    await coroutine_to_execute(task)
+                except APIError as err:
+                    # The API has already been retried, so report this task and carry on with the others
+                    console.log(f"Error: {err}")
+                    failed_tasks.append(task)
+                except Exception:
+                    console.print_exception()
+                    failed_tasks.append(task)
+
+            progress.advance(progress_task_id)
+
+        await gather(*[task_progress_wrapper(task) for task in tasks])
+
+    if len(failed_tasks) > 0:
+        console.log(f"{len(failed_tasks)} of {len(tasks)} tasks failed.")
+
+    return failed_tasks
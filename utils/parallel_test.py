@@ -0,0 +1,32 @@
+import unittest
+
+from rich.console import Console
+
+from utils.parallel import parallel_execute_tasks_with_progress
+
+
+class TestParallel(unittest.TestCase):
+    def test_most_expensive_tasks_start_first(self):
+        order = []
+
+        parallel_execute_tasks_with_progress(
+            Console(quiet=True),
+            "Testing...",
+            order.append,
+            [3, 10, 1, 7],
+            1,
+            cost=lambda task: task,
+        )
+
+        self.assertEqual([10, 7, 3, 1], order)
+
+    def test_failed_tasks_are_returned(self):
+        def fail_odd(task: int):
+            if task % 2 == 1:
+                raise ValueError(task)
+
+        failed = parallel_execute_tasks_with_progress(
+            Console(quiet=True), "Testing...", fail_odd, [1, 2, 3], 2
+        )
+
+        self.assertEqual([1, 3], sorted(failed))
@@ -0,0 +1,202 @@
+from asyncio import Semaphore, create_task, gather, get_running_loop, run
+from itertools import count
+from queue import PriorityQueue, Queue
+from threading import Lock, Thread
+
+from rich.console import Console
+
+from utils.api import API, APIError
+from utils.async_api import AsyncAPI
+from utils.findings_cache import FindingsCache
+from utils.list_of_applications import (
+    AppSandboxInfo,
+    acquire_application_info,
+    app_sandbox_index_key,
+)
+from utils.mitigation_candidate import MitigationCandidate
+from utils.processor import (
+    fetch_findings,
+    fetch_findings_async,
+    process_candidates,
+)
+
+# Marks the end of the work for a stage
+STOP = None
+
+# Sorts after any real work in the fetch queue
+STOP_PRIORITY = (float("inf"), 0)
+
+
+def resolve_and_process_candidates(
+    console: Console,
+    api: API,
+    candidates: list[MitigationCandidate],
+    application_cache_file_path: str,
+    number_of_threads: int,
+    bulk_resolution_threshold: int,
+    findings_cache: FindingsCache,
+    async_api: AsyncAPI = None,
+):
+    """Resolve applications, fetch findings and evaluate candidates as overlapping stages.
+
+    Findings for a scan are fetched as soon as its application (and sandbox) is resolved, and the
+    candidates for that scan are evaluated as soon as its findings arrive. Only the queue into the
+    evaluator is bounded, so fetching cannot run too far ahead of evaluation.
+
+    Given an async API, findings are fetched from one event loop instead of by a pool of threads.
+    """
+    groups: dict[tuple[str, str], list[MitigationCandidate]] = {}
+    groups_lock = Lock()
+
+    for candidate in candidates:
+        groups.setdefault(
+            app_sandbox_index_key(candidate.application_name, candidate.sandbox_name),
+            [],
+        ).append(candidate)
+
+    # Biggest scans first, using the finding count from previous runs when it is known. Not bounded, as
+    # it only holds candidates that are already in memory and a bound would let scans start in arrival order.
+    fetch_queue: PriorityQueue = PriorityQueue()
+    fetch_order = count()
+    evaluate_queue: Queue = Queue(maxsize=number_of_threads * 2)
+
+    def scan_priority(info: AppSandboxInfo, group_size: int) -> tuple[int, int]:
+        finding_count = findings_cache.get_finding_count(
+            (info.application_guid, info.sandbox_guid)
+        )
+        return (-(finding_count or 0), -group_size)
+
+    def resolved_order(info: AppSandboxInfo) -> tuple[int, int]:
+        with groups_lock:
+            group = groups.get(
+                app_sandbox_index_key(info.application_name, info.sandbox_name), []
+            )
+
+        return scan_priority(info, len(group))
+
+    def on_resolved(info: AppSandboxInfo):
+        with groups_lock:
+            group = groups.pop(
+                app_sandbox_index_key(info.application_name, info.sandbox_name), None
+            )
+
+        # Another entry for the same application and sandbox has already been queued
+        if group is None:
+            return
+
+        for candidate in group:
+            candidate.application_guid = info.application_guid
+            candidate.sandbox_guid = info.sandbox_guid
+
+        fetch_queue.put((scan_priority(info, len(group)), next(fetch_order), group))
+
+    def fetch_worker():
+        while (group := fetch_queue.get()[2]) is not STOP:
+            scan = group[0].app_guid_key
+
+            # An application found to be ambiguous after it was queued has its GUIDs taken back
+            if scan[0] is None:
+                continue
+
+            try:
+                findings = fetch_findings(
+                    api,
+                    findings_cache,
+                    scan,
+                    set([(c.flaw_id, c.cwe) for c in group]),
+                )
+            except APIError as err:
+                console.log(f"Error: {err}")
+                findings = None
+            except Exception:
+                console.print_exception()
+                findings = None
+
+            evaluate_queue.put((scan, group, findings))
+
+    async def fetch_group_async(group: list[MitigationCandidate]):
+        scan = group[0].app_guid_key
+
+        if scan[0] is None:
+            return
+
+        try:
+            findings = await fetch_findings_async(
+                async_api,
+                findings_cache,
+                scan,
+                set([(c.flaw_id, c.cwe) for c in group]),
+            )
+        except APIError as err:
+            console.log(f"Error: {err}")
+            findings = None
+        except Exception:
+            console.print_exception()
+            findings = None
+
+        await get_running_loop().run_in_executor(
+            None, evaluate_queue.put, (scan, group, findings)
+        )
+
+    async def fetch_groups_async():
+        loop = get_running_loop()
+        # Only take the next scan once there is room for it, so the biggest waiting scan always goes next
+        slots = Semaphore(async_api.max_in_flight_requests)
+        fetches = []
+
+        async with async_api:
+            while True:
+                await slots.acquire()
+                group = (await loop.run_in_executor(None, fetch_queue.get))[2]
+
+                if group is STOP:
+                    break
+
+                fetch = create_task(fetch_group_async(group))
+                fetch.add_done_callback(lambda _: slots.release())
+                fetches.append(fetch)
+
+            await gather(*fetches)
+
+    def evaluate_worker():
+        while (item := evaluate_queue.get()) is not STOP:
+            scan, group, findings = item
+
+            # This is the only evaluator, if it stopped the queues would fill and the run would hang
+            try:
+                process_candidates(console, group, {scan: findings})
+            except Exception:
+                console.print_exception()
+
+    if async_api is None:
+        fetch_workers = [Thread(target=fetch_worker) for _ in range(number_of_threads)]
+    else:
+        fetch_workers = [Thread(target=run, args=(fetch_groups_async(),))]
+
+    evaluate_workers = [Thread(target=evaluate_worker)]
+
+    for worker in fetch_workers + evaluate_workers:
+        worker.start()
+
+    try:
+        acquire_application_info(
+            console,
+            api,
+            candidates,
+            application_cache_file_path,
+            number_of_threads,
+            bulk_resolution_threshold,
+            on_resolved,
+            resolved_order,
+        )
+    finally:
+        for _ in fetch_workers:
+            fetch_queue.put((STOP_PRIORITY, next(fetch_order), STOP))
+
+        for worker in fetch_workers:
+            worker.join()
+
+        evaluate_queue.put(STOP)
+
+        for worker in evaluate_workers:
+            worker.join()
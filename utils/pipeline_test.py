@@ -0,0 +1,196 @@
+import unittest
+from json import dump
+from os import path
+from tempfile import TemporaryDirectory
+from threading import Event, Thread
+from unittest.mock import patch
+
+from rich.console import Console
+
+from utils.findings_cache import FindingsCache
+from utils.list_of_applications import populate_app_details
+from utils.list_of_applications_test import (
+    FakeAPI,
+    candidates_for_acquire,
+    fake_applications,
+    fake_sandboxes,
+)
+from utils.mitigation_candidate import MitigationCandidate
+from utils.pipeline import resolve_and_process_candidates
+
+
+class FakeFindingsAPI(FakeAPI):
+    def get_findings(
+        self, application_guid: str, sandbox_guid: str = None, cwes: set[int] = None
+    ):
+        self.calls.append(f"get_findings:{application_guid},{sandbox_guid}")
+        return [
+            {
+                "finding_details": {"cwe": {"id": "1"}},
+                "issue_id": "2",
+                "finding_status": {
+                    "status": "OPEN",
+                    "resolution": "UNRESOLVED",
+                    "mitigation_review_status": "NONE",
+                    "resolution_status": "NONE",
+                },
+            }
+        ]
+
+
+class MalformedFindingsAPI(FakeFindingsAPI):
+    def get_findings(
+        self, application_guid: str, sandbox_guid: str = None, cwes: set[int] = None
+    ):
+        self.calls.append(f"get_findings:{application_guid},{sandbox_guid}")
+        # No "finding_status", so evaluating it fails
+        return [{"finding_details": {"cwe": {"id": "1"}}, "issue_id": "1"}]
+
+
+class WaitForResolutionAPI(FakeFindingsAPI):
+    def __init__(self, applications, sandboxes):
+        super().__init__(applications, sandboxes)
+        self.resolution_finished = Event()
+
+    def get_findings(
+        self, application_guid: str, sandbox_guid: str = None, cwes: set[int] = None
+    ):
+        # Hold up the only fetcher until every application has been resolved
+        self.resolution_finished.wait(5)
+        return super().get_findings(application_guid, sandbox_guid, cwes)
+
+
+class TestPipeline(unittest.TestCase):
+    def test_resolve_and_process_candidates(self):
+        api = FakeFindingsAPI(fake_applications, fake_sandboxes)
+        candidates = candidates_for_acquire()
+        candidates[1].mitigate_by_design = "by design"
+
+        resolve_and_process_candidates(
+            Console(quiet=True),
+            api,
+            candidates,
+            None,
+            2,
+            100,
+            FindingsCache(None, 0),
+        )
+
+        self.assertEqual("guid-b", candidates[1].application_guid)
+        self.assertEqual("sandbox-b", candidates[1].sandbox_guid)
+        self.assertEqual({"APPDESIGN": "by design"}, dict(candidates[1].actions))
+        self.assertEqual(0, len(candidates[0].actions))
+        self.assertEqual(
+            ["get_findings:guid-a,None", "get_findings:guid-b,sandbox-b"],
+            sorted([c for c in api.calls if c.startswith("get_findings")]),
+        )
+
+    def test_ambiguous_applications_are_not_fetched(self):
+        candidates = candidates_for_acquire()
+        api = WaitForResolutionAPI(
+            fake_applications + [{"guid": "guid-b2", "profile": {"name": "app b"}}],
+            fake_sandboxes,
+        )
+
+        def finish_resolution(candidates, app_infos):
+            populate_app_details(candidates, app_infos)
+            api.resolution_finished.set()
+
+        # "App B" is queued before its second profile is listed and taken back at the end
+        with patch(
+            "utils.list_of_applications.populate_app_details",
+            side_effect=finish_resolution,
+        ):
+            resolve_and_process_candidates(
+                Console(quiet=True),
+                api,
+                candidates,
+                None,
+                1,
+                2,
+                FindingsCache(None, 0),
+            )
+
+        self.assertIsNone(candidates[1].application_guid)
+        self.assertEqual(
+            ["get_findings:guid-a,None"],
+            [c for c in api.calls if c.startswith("get_findings")],
+        )
+
+    def test_evaluation_errors_do_not_hang_the_pipeline(self):
+        applications = [
+            {"guid": f"guid-{i}", "profile": {"name": f"App {i}"}} for i in range(10)
+        ]
+        api = MalformedFindingsAPI(applications, {})
+        candidates = [
+            MitigationCandidate(f"App {i}", None, 1, 1, "x", None, None, None, None)
+            for i in range(10)
+        ]
+
+        run = Thread(
+            target=resolve_and_process_candidates,
+            args=(
+                Console(quiet=True),
+                api,
+                candidates,
+                None,
+                1,
+                100,
+                FindingsCache(None, 0),
+            ),
+            daemon=True,
+        )
+        run.start()
+        run.join(timeout=10)
+
+        self.assertFalse(run.is_alive())
+        self.assertEqual(
+            10, len([c for c in api.calls if c.startswith("get_findings")])
+        )
+
+    def test_biggest_scans_are_fetched_first(self):
+        scan_count = 20
+        # The biggest scan is the last one listed in the application cache
+        finding_counts = {f"guid-{i}_None": (i + 1) * 10 for i in range(scan_count)}
+        applications = [
+            {"guid": f"guid-{i}", "profile": {"name": f"App {i}"}}
+            for i in range(scan_count)
+        ]
+        api = FakeFindingsAPI(applications, {})
+        candidates = [
+            MitigationCandidate(f"App {i}", None, 1, 2, "x", None, None, None, None)
+            for i in range(scan_count)
+        ]
+
+        with TemporaryDirectory() as directory:
+            application_cache_file_path = path.join(directory, "cache.csv")
+
+            with open(application_cache_file_path, "w") as cache_file:
+                cache_file.writelines(
+                    [f"App {i},guid-{i},,\n" for i in range(scan_count)]
+                )
+
+            findings_cache_path = path.join(directory, "findings")
+            findings_cache = FindingsCache(findings_cache_path, 0)
+
+            with open(
+                path.join(findings_cache_path, "finding_counts.json"), "w"
+            ) as finding_counts_file:
+                dump(finding_counts, finding_counts_file)
+
+            findings_cache.load_finding_counts()
+
+            resolve_and_process_candidates(
+                Console(quiet=True),
+                api,
+                candidates,
+                application_cache_file_path,
+                1,
+                100,
+                findings_cache,
+            )
+
+        self.assertEqual(
+            [f"get_findings:guid-{i},None" for i in reversed(range(scan_count))],
+            [c for c in api.calls if c.startswith("get_findings")],
+        )
@@ -0,0 +1,136 @@
+from csv import DictReader, writer as csv_writer
+from collections.abc import Iterable, Iterator
+from json import dumps, loads
+from pathlib import Path
+
+from utils.mitigation_candidate import (
+    ACTION_FIELDS,
+    ACTION_ORDER,
+    NO_ANNOTATION,
+    MitigationCandidate,
+)
+
+# Columns of a CSV plan, followed by one column per action holding its comment
+PLAN_CSV_FIELDS = [
+    "application_name",
+    "application_guid",
+    "sandbox_name",
+    "sandbox_guid",
+    "flaw_id",
+    "cwe",
+]
+
+
+def is_csv_plan(file_path: str) -> bool:
+    return Path(file_path).suffix.lower() == ".csv"
+
+
+def write_plan(file_path: str, candidates: Iterable[MitigationCandidate]) -> int:
+    """Writes the actions to take as CSV if the path ends in ".csv", otherwise as JSON lines. Returns the number of flaws written."""
+    flaw_count = 0
+
+    with open(file_path, "w", newline="", encoding="utf-8") as plan_file:
+        writer = None
+
+        if is_csv_plan(file_path):
+            writer = csv_writer(plan_file)
+            writer.writerow(PLAN_CSV_FIELDS + ACTION_ORDER)
+
+        # Written as we go so even a very large plan never builds up in memory
+        for candidate in candidates:
+            actions = candidate.actions
+
+            if writer is not None:
+                writer.writerow(
+                    [
+                        candidate.application_name,
+                        candidate.application_guid,
+                        candidate.sandbox_name or "",
+                        candidate.sandbox_guid or "",
+                        candidate.flaw_id,
+                        candidate.cwe,
+                    ]
+                    + [actions.get(action, "") for action in ACTION_ORDER]
+                )
+            else:
+                plan_file.write(
+                    dumps(
+                        {
+                            "application_name": candidate.application_name,
+                            "application_guid": candidate.application_guid,
+                            "sandbox_name": candidate.sandbox_name,
+                            "sandbox_guid": candidate.sandbox_guid,
+                            "flaw_id": candidate.flaw_id,
+                            "cwe": candidate.cwe,
+                            "actions": actions,
+                        }
+                    )
+                    + "\n"
+                )
+
+            flaw_count = flaw_count + 1
+
+    return flaw_count
+
+
+def plan_candidate(
+    application_name: str,
+    application_guid: str,
+    sandbox_name: str,
+    sandbox_guid: str,
+    flaw_id: int,
+    cwe: int,
+    actions: dict[str, str],
+) -> MitigationCandidate:
+    comments = {ACTION_FIELDS[action]: comment for action, comment in actions.items()}
+    candidate = MitigationCandidate(
+        application_name,
+        sandbox_name,
+        cwe,
+        flaw_id,
+        comments.get("mitigate_by_design"),
+        comments.get("false_positive"),
+        comments.get("accept_risk"),
+        comments.get("approve"),
+        comments.get("reject"),
+    )
+    candidate.application_guid = application_guid
+    candidate.sandbox_guid = sandbox_guid
+
+    # The plan only holds actions that were still needed when it was made
+    for action in actions:
+        candidate.add_action(action, NO_ANNOTATION)
+
+    return candidate
+
+
+def load_plan(file_path: str) -> Iterator[MitigationCandidate]:
+    with open(file_path, newline="", encoding="utf-8") as plan_file:
+        if is_csv_plan(file_path):
+            for row in DictReader(plan_file):
+                yield plan_candidate(
+                    row["application_name"],
+                    row["application_guid"],
+                    row["sandbox_name"] or None,
+                    row["sandbox_guid"] or None,
+                    int(row["flaw_id"]),
+                    int(row["cwe"]),
+                    {action: row[action] for action in ACTION_ORDER if row[action]},
+                )
+
+            return
+
+        for line in plan_file:
+            if len(line.strip()) < 1:
+                continue
+
+            entry = loads(line)
+            yield plan_candidate(
+                entry["application_name"],
+                entry["application_guid"],
+                entry["sandbox_name"],
+                entry["sandbox_guid"],
+                entry["flaw_id"],
+                entry["cwe"],
+                entry["actions"],
+            )
@@ -0,0 +1,82 @@
+import unittest
+from os import path
+from tempfile import TemporaryDirectory
+
+from utils.mitigation_candidate import MitigationCandidate
+from utils.plan import load_plan, write_plan
+
+
+def planned_candidates() -> list[MitigationCandidate]:
+    policy = MitigationCandidate(
+        "abc", None, 78, 1, "By design", None, None, "OK", None
+    )
+    policy.application_guid = "guid-a"
+    policy.add_action("APPDESIGN", {"action": "", "comment": ""})
+    # Already proposed, so only the approval is still needed
+    policy.add_action("ACCEPTED", {"action": "", "comment": ""})
+
+    sandbox = MitigationCandidate(
+        "abc", "Dev", 89, 2, None, 'Not "real", honest', None, None, None
+    )
+    sandbox.application_guid = "guid-a"
+    sandbox.sandbox_guid = "sandbox-a"
+    sandbox.add_action("FP", {"action": "", "comment": ""})
+
+    return [policy, sandbox]
+
+
+class TestPlan(unittest.TestCase):
+    def assert_round_trip(self, file_name: str):
+        candidates = planned_candidates()
+
+        with TemporaryDirectory() as directory:
+            plan_file_path = path.join(directory, file_name)
+            flaw_count = write_plan(plan_file_path, candidates)
+            loaded = list(load_plan(plan_file_path))
+
+        self.assertEqual(2, flaw_count)
+        self.assertEqual(
+            [
+                (
+                    c.app_name_key,
+                    c.app_guid_key,
+                    c.flaw_id,
+                    c.cwe,
+                    c.actions,
+                    c.requested_actions,
+                )
+                for c in candidates
+            ],
+            [
+                (
+                    c.app_name_key,
+                    c.app_guid_key,
+                    c.flaw_id,
+                    c.cwe,
+                    c.actions,
+                    c.requested_actions,
+                )
+                for c in loaded
+            ],
+        )
+
+    def test_json_lines_plan_round_trip(self):
+        self.assert_round_trip("plan.jsonl")
+
+    def test_csv_plan_round_trip(self):
+        self.assert_round_trip("plan.csv")
+
+    def test_plan_only_holds_actions_still_needed(self):
+        candidate = MitigationCandidate(
+            "abc", None, 78, 1, "By design", None, None, "OK", None
+        )
+        candidate.application_guid = "guid-a"
+        candidate.add_action("ACCEPTED", {"action": "", "comment": ""})
+
+        with TemporaryDirectory() as directory:
+            plan_file_path = path.join(directory, "plan.jsonl")
+            write_plan(plan_file_path, [candidate])
+            loaded = list(load_plan(plan_file_path))
+
+        self.assertEqual({"ACCEPTED": "OK"}, loaded[0].actions)
+        self.assertIsNone(loaded[0].mitigate_by_design)
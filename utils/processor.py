@@ -1,64 +1,153 @@
-from json import dumps, load
-from os.path import exists
 from rich.console import Console
 
 from utils.api import API
+from utils.async_api import AsyncAPI
+from utils.findings_cache import FindingsCache
 from utils.mitigation_candidate import MitigationCandidate
-from utils.parallel import parallel_execute_tasks_with_progress
 
+# Above this many distinct CWEs in a scan the filter saves little, so fetch every finding instead
+MAX_CWE_FILTER_SIZE = 20
 
-def get_flaws(
-    console: Console,
+
+def finding_key(finding: dict) -> tuple[int, int]:
+    return int(finding["issue_id"]), int(finding["finding_details"]["cwe"]["id"])
+
+
+def reduce_finding(finding: dict) -> dict:
+    # Only keep what populate_actions looks at, the full finding details are large
+    reduced = {
+        "issue_id": finding["issue_id"],
+        "finding_details": {"cwe": {"id": finding["finding_details"]["cwe"]["id"]}},
+        "finding_status": finding.get("finding_status"),
+    }
+
+    if "annotations" in finding:
+        reduced["annotations"] = [MitigationCandidate.get_last_annotation(finding)]
+
+    return reduced
+
+
+def findings_cwe_filter(
+    findings_cache: FindingsCache, flaw_keys: set[tuple[int, int]]
+) -> set[int]:
+    cwes = set([cwe for _, cwe in flaw_keys])
+
+    # The cache must hold every finding in the scan, so only filter by CWE when it is not in use
+    if findings_cache.enabled or len(cwes) > MAX_CWE_FILTER_SIZE:
+        return None
+
+    return cwes
+
+
+def keep_finding(
+    findings_cache: FindingsCache,
+    flaw_keys: set[tuple[int, int]],
+    finding: dict,
+    findings: list[dict],
+):
+    # Likewise keep every finding for the cache, otherwise only the ones asked for this time
+    if findings_cache.enabled or finding_key(finding) in flaw_keys:
+        findings.append(reduce_finding(finding))
+
+
+def fetched_findings(
+    findings_cache: FindingsCache,
+    scan: tuple[str, str],
+    flaw_keys: set[tuple[int, int]],
+    cwes: set[int],
+    findings: list[dict],
+    finding_count: int,
+) -> list[dict]:
+    if finding_count < 1:
+        # With a filter this only means none of the findings have the CWEs asked for
+        return None if cwes is None else []
+
+    findings_cache.add(scan, findings)
+
+    return [finding for finding in findings if finding_key(finding) in flaw_keys]
+
+
+def cached_findings(
+    findings: list[dict], flaw_keys: set[tuple[int, int]]
+) -> list[dict]:
+    if len(findings) < 1:
+        return None
+
+    return [finding for finding in findings if finding_key(finding) in flaw_keys]
+
+
+def fetch_findings(
     api: API,
-    candidates: list[MitigationCandidate],
-    number_of_threads: int,
-    debug: bool = False,
-) -> dict[str, dict]:
-    if debug and exists("data/findings.json"):
-        with open("data/findings.json", "r") as d:
-            return load(d)
-
-    scans_to_find = list(set([x.app_guid_key() for x in candidates]))
-    flaws = {}
-
-    def process_application(scan: str):
-        application_guid, sandbox_guid = scan.split("§")
-
-        if sandbox_guid == str(None):
-            sandbox_guid = None
-
-        findings = api.get_findings(
-            application_guid,
-            sandbox_guid,
-        )
-
-        if findings:
-            flaws[scan] = findings
-
-    scan_count_pluralised = "" if len(scans_to_find) == 1 else "s"
-
-    parallel_execute_tasks_with_progress(
-        console,
-        f"Processing {len(scans_to_find)} scan{scan_count_pluralised}...",
-        process_application,
-        scans_to_find,
-        number_of_threads,
+    findings_cache: FindingsCache,
+    scan: tuple[str, str],
+    flaw_keys: set[tuple[int, int]],
+) -> list[dict]:
+    findings = findings_cache.get(scan)
+
+    if findings is not None:
+        return cached_findings(findings, flaw_keys)
+
+    application_guid, sandbox_guid = scan
+    cwes = findings_cwe_filter(findings_cache, flaw_keys)
+    findings = []
+    finding_count = 0
+
+    for finding in api.get_findings(application_guid, sandbox_guid, cwes):
+        finding_count = finding_count + 1
+        keep_finding(findings_cache, flaw_keys, finding, findings)
+
+    return fetched_findings(
+        findings_cache, scan, flaw_keys, cwes, findings, finding_count
     )
 
-    if debug:
-        with open("data/findings.json", "w") as d:
-            d.write(dumps(flaws, indent=4))
 
-    return flaws
+async def fetch_findings_async(
+    api: AsyncAPI,
+    findings_cache: FindingsCache,
+    scan: tuple[str, str],
+    flaw_keys: set[tuple[int, int]],
+) -> list[dict]:
+    findings = findings_cache.get(scan)
+
+    if findings is not None:
+        return cached_findings(findings, flaw_keys)
+
+    application_guid, sandbox_guid = scan
+    cwes = findings_cwe_filter(findings_cache, flaw_keys)
+    findings = []
+    finding_count = 0
+
+    async for finding in api.get_findings(application_guid, sandbox_guid, cwes):
+        finding_count = finding_count + 1
+        keep_finding(findings_cache, flaw_keys, finding, findings)
+
+    return fetched_findings(
+        findings_cache, scan, flaw_keys, cwes, findings, finding_count
+    )
+
+
+def index_findings(findings: list[dict]) -> dict[tuple[int, int], dict]:
+    # Keyed by (issue_id, cwe) so candidates can be matched without scanning every finding
+    return {finding_key(finding): finding for finding in findings}
 
 
 def process_candidates(
     console: Console,
     candidates: list[MitigationCandidate],
-    findings: dict[str, dict],
+    findings: dict[tuple[str, str], list[dict]],
 ):
+    findings_indexes = {}
+
     for candidate in candidates:
-        found_findings = findings[candidate.app_guid_key()]
+        scan = candidate.app_guid_key
+
+        if scan not in findings_indexes:
+            found_findings = findings.get(scan)
+            findings_indexes[scan] = (
+                None if found_findings is None else index_findings(found_findings)
+            )
+
+        found_findings = findings_indexes[scan]
 
         if found_findings is None:
             sandbox_text = ""
@@ -0,0 +1,86 @@
+import unittest
+
+from tempfile import TemporaryDirectory
+
+from utils.findings_cache import FindingsCache
+from utils.processor import MAX_CWE_FILTER_SIZE, fetch_findings
+
+scan = ("guid-a", None)
+
+
+def finding(issue_id: int, cwe: int) -> dict:
+    return {
+        "issue_id": str(issue_id),
+        "finding_details": {"cwe": {"id": str(cwe)}, "file_path": "a/very/long/path"},
+        "finding_status": {"status": "OPEN"},
+        "annotations": [
+            {
+                "action": "COMMENT",
+                "comment": "old",
+                "created": "2023-03-07T19:17:45.175Z",
+            },
+            {"action": "FP", "comment": "new", "created": "2024-03-07T19:17:45.175Z"},
+        ],
+    }
+
+
+class FakeAPI:
+    def __init__(self, findings: list[dict]):
+        self.findings = findings
+        self.cwe_filters = []
+
+    def get_findings(
+        self, application_guid: str, sandbox_guid: str = None, cwes: set[int] = None
+    ):
+        self.cwe_filters.append(cwes)
+        return iter(self.findings)
+
+
+class TestProcessor(unittest.TestCase):
+    def test_fetch_findings_keeps_only_requested_flaws(self):
+        api = FakeAPI([finding(1, 78), finding(2, 78), finding(3, 89)])
+
+        findings = fetch_findings(api, FindingsCache(None, 0), scan, {(2, 78), (3, 78)})
+
+        self.assertEqual(1, len(findings))
+        self.assertEqual("2", findings[0]["issue_id"])
+        self.assertNotIn("file_path", findings[0]["finding_details"])
+        self.assertEqual(["new"], [a["comment"] for a in findings[0]["annotations"]])
+
+    def test_fetch_findings_for_empty_scan(self):
+        flaw_keys = set([(i, i) for i in range(1, MAX_CWE_FILTER_SIZE + 2)])
+
+        self.assertIsNone(
+            fetch_findings(FakeAPI([]), FindingsCache(None, 0), scan, flaw_keys)
+        )
+
+    def test_fetch_findings_filters_by_cwe(self):
+        api = FakeAPI([finding(2, 78)])
+
+        fetch_findings(api, FindingsCache(None, 0), scan, {(2, 78), (3, 89)})
+
+        self.assertEqual([{78, 89}], api.cwe_filters)
+
+    def test_fetch_findings_does_not_filter_many_cwes(self):
+        api = FakeAPI([finding(2, 78)])
+        flaw_keys = set([(i, i) for i in range(1, MAX_CWE_FILTER_SIZE + 2)])
+
+        fetch_findings(api, FindingsCache(None, 0), scan, flaw_keys)
+
+        self.assertEqual([None], api.cwe_filters)
+
+    def test_fetch_findings_does_not_filter_when_caching(self):
+        api = FakeAPI([finding(1, 78), finding(2, 89)])
+
+        with TemporaryDirectory() as directory:
+            findings_cache = FindingsCache(directory, 60)
+            fetch_findings(api, findings_cache, scan, {(2, 89)})
+            cached_findings = findings_cache.get(scan)
+
+        self.assertEqual([None], api.cwe_filters)
+        self.assertEqual(2, len(cached_findings))
+
+    def test_fetch_findings_for_scan_without_the_filtered_cwes(self):
+        findings = fetch_findings(FakeAPI([]), FindingsCache(None, 0), scan, {(1, 78)})
+
+        self.assertEqual([], findings)
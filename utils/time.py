@@ -1,8 +1,4 @@
-from datetime import datetime
-
-
-def parse_from_veracode_date_time(input: str):
-    return datetime.strptime(
-        input,
-        "%Y-%m-%dT%H:%M:%S.%fZ",
-    )
+def veracode_date_time_sort_key(input: str) -> str:
+    # The format is lexicographically sortable once the fractional seconds are the same width
+    seconds, _, fraction = input.rstrip("Z").partition(".")
+    return f"{seconds}.{fraction.ljust(6, '0')}"